@@ -0,0 +1,134 @@
+"""Colors, data paths and buttons shared by the portal, teacher and student UIs.
+
+Kept free of either role's modules so the portal window can open without
+importing teacher_qt or student_qt.
+"""
+import os
+import sys
+from PyQt6.QtWidgets import QPushButton, QVBoxLayout, QLabel, QGraphicsDropShadowEffect
+from PyQt6.QtCore import Qt, QPropertyAnimation, QRect, QEasingCurve
+from PyQt6.QtGui import QColor, QFont
+
+NU_BLUE = "#0B2C5D"
+NU_HOVER = "#154c9e"
+
+def get_data_path(subfolder):
+    """Get the correct path for data folders (exams, logs, classes) in proctora_data directory"""
+    if getattr(sys, 'frozen', False):
+        # Running as a PyInstaller bundle - use current working directory
+        base_path = os.getcwd()
+    else:
+        # Running from source - use script directory
+        base_path = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base_path, 'proctora_data', subfolder)
+
+class AnimatedBubbleButton(QPushButton):
+    def __init__(self, text, parent=None, color=NU_BLUE, radius=25, text_col="white", animate=True):
+        super().__init__(text, parent)
+        self.default_color = color
+        self.hover_color = NU_HOVER if color == NU_BLUE else "#c5d9f7"
+        self.radius = radius
+        self.text_col = text_col
+        self.animate = animate
+        self.orig_geo = None
+        
+        # Add shadow effect for floating appearance
+        shadow = QGraphicsDropShadowEffect(self)
+        shadow.setBlurRadius(8)
+        shadow.setXOffset(0)
+        shadow.setYOffset(3)
+        shadow.setColor(QColor(0, 0, 0, 80))
+        self.setGraphicsEffect(shadow)
+        
+        # Set font to bold
+        font = QFont("Poppins", 15, QFont.Weight.Bold)
+        self.setFont(font)
+        
+        self.setStyleSheet(self._get_style(self.default_color))
+        self.setCursor(Qt.CursorShape.PointingHandCursor)
+        self._animation = QPropertyAnimation(self, b"geometry")
+        self._animation.setDuration(100)
+        self._animation.setEasingCurve(QEasingCurve.Type.OutQuad)
+
+    def _get_style(self, bg_color):
+        return f"QPushButton {{ background-color: {bg_color}; color: {self.text_col}; border-radius: {self.radius}px; font-size: 15px; font-weight: bold; border: none; font-family: Poppins; }}"
+
+    def enterEvent(self, event):
+        self.setStyleSheet(self._get_style(self.hover_color))
+        if self.animate:
+            if not self.orig_geo: self.orig_geo = self.geometry()
+            self._animation.setEndValue(QRect(self.orig_geo.x() - 8, self.orig_geo.y() - 3, self.orig_geo.width() + 16, self.orig_geo.height() + 6))
+            self._animation.start()
+
+    def leaveEvent(self, event):
+        self.setStyleSheet(self._get_style(self.default_color))
+        if self.animate and self.orig_geo:
+            self._animation.setEndValue(self.orig_geo)
+            self._animation.start()
+
+class IconSquareButton(QPushButton):
+    """Square button with large icon on top and small text below for the teacher menu"""
+    def __init__(self, text, icon_char="📋", parent=None, color=NU_BLUE, text_color="white", size=120):
+        super().__init__(parent)
+        self.default_color = color
+        self.hover_color = NU_HOVER if color == NU_BLUE else "#c5d9f7"
+        self.text_color = text_color
+        self.size = size
+        
+        # Set fixed square size
+        self.setFixedSize(size, size)
+        self.setCursor(Qt.CursorShape.PointingHandCursor)
+        
+        # Add shadow effect for floating appearance
+        shadow = QGraphicsDropShadowEffect(self)
+        shadow.setBlurRadius(10)
+        shadow.setXOffset(0)
+        shadow.setYOffset(2)
+        shadow.setColor(QColor(0, 0, 0, 100))
+        self.setGraphicsEffect(shadow)
+        
+        # Create a layout for the button content with separate icon and text
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(1)
+        
+        # Icon label (large - 32px)
+        icon_label = QLabel(icon_char)
+        icon_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        icon_font = QFont("Poppins", 40)
+        icon_label.setFont(icon_font)
+        icon_label.setStyleSheet(f"color: {self.text_color}; background: transparent; border: none;")
+        layout.addWidget(icon_label, alignment=Qt.AlignmentFlag.AlignCenter)
+        
+        # Text label (small - 8px) - NOW BOLD
+        text_label = QLabel(text)
+        text_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        text_font = QFont("Poppins", 12)
+        text_font.setBold(True)
+        text_label.setFont(text_font)
+        text_label.setStyleSheet(f"color: {self.text_color}; background: transparent; border: none;")
+        text_label.setWordWrap(True)
+        layout.addWidget(text_label, alignment=Qt.AlignmentFlag.AlignCenter)
+        
+        self._update_style(self.default_color)
+    
+    def _update_style(self, bg_color):
+        """Update button style"""
+        style = f"""
+            QPushButton {{
+                background-color: {bg_color};
+                border: none;
+                border-radius: 6px;
+                padding: 2px;
+            }}
+            QPushButton:hover {{
+                background-color: {self.hover_color};
+            }}
+        """
+        self.setStyleSheet(style)
+    
+    def enterEvent(self, event):
+        self._update_style(self.hover_color)
+    
+    def leaveEvent(self, event):
+        self._update_style(self.default_color)
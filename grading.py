@@ -0,0 +1,77 @@
+"""Server-side grading: answer keys stay on the teacher machine.
+
+Students receive strip_answer_key(exam) and send back their raw answers,
+ordered by question id. The teacher compiles each exam once into an
+AnswerKey and scores submissions against it.
+"""
+import operator
+
+ANSWER_FIELDS = ("answer_index", "correct_tf", "answer_text")
+
+# Stands in for a missing key so an unanswered question never counts as correct
+_NO_KEY = object()
+
+
+def strip_answer_key(exam):
+    """Copy of an exam that is safe to send to students: no answer fields, each question tagged with its id"""
+    questions = []
+    for i, q in enumerate(exam.get("questions", [])):
+        public = {k: v for k, v in q.items() if k not in ANSWER_FIELDS}
+        public["id"] = i
+        questions.append(public)
+    return {
+        "exam_name": exam.get("exam_name"),
+        "questions": questions,
+        "settings": exam.get("settings", {}),
+    }
+
+
+def _normalize(q_type, value):
+    """Map a raw answer to the form stored in the key (choice index, 1/0, or folded text)"""
+    if q_type in ("mcq", "tf"):
+        if isinstance(value, bool):
+            return int(value)
+        return value if isinstance(value, int) and value >= 0 else None
+    if q_type == "text":
+        return value.strip().lower() if isinstance(value, str) else None
+    return None
+
+
+class AnswerKey:
+    """An exam's answer key compiled into flat arrays indexed by question id"""
+
+    def __init__(self, exam):
+        questions = exam.get("questions", [])
+        self.types = tuple(q.get("type") for q in questions)
+        self.expected = tuple(self._expected(q) for q in questions)
+
+    @staticmethod
+    def _expected(q):
+        if q.get("type") == "mcq":
+            value = _normalize("mcq", q.get("answer_index"))
+        elif q.get("type") == "tf":
+            value = _normalize("tf", q.get("correct_tf"))
+        elif q.get("type") == "text":
+            value = _normalize("text", q.get("answer_text")) or None
+        else:
+            value = None
+        return _NO_KEY if value is None else value
+
+    @property
+    def total(self):
+        return len(self.expected)
+
+    def normalize(self, answers):
+        """Raw answers (list ordered by question id) -> tuple aligned with the key"""
+        answers = list(answers or [])[:self.total]
+        answers += [None] * (self.total - len(answers))
+        return tuple(map(_normalize, self.types, answers))
+
+    def grade(self, answers):
+        """Score one submission"""
+        return sum(map(operator.eq, self.expected, self.normalize(answers)))
+
+    def grade_many(self, submissions):
+        """Score a batch of submissions (e.g. a whole class after the key was corrected)"""
+        expected = self.expected
+        return [sum(map(operator.eq, expected, self.normalize(answers))) for answers in submissions]
@@ -1,14 +1,18 @@
+import time
+STARTED = time.perf_counter()  # for the startup timing report
+
 import sys
 import os
-from PyQt6.QtWidgets import QApplication, QMainWindow, QLabel, QLineEdit, QMessageBox, QWidget,QPushButton
+import importlib
+from PyQt6.QtWidgets import QApplication, QMainWindow, QLabel, QLineEdit, QMessageBox, QWidget,QPushButton, QComboBox
 from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QPixmap,  QFontDatabase, QIcon
 
-# Import the other windows
+# The teacher and student windows (teacher_qt, student_qt) are imported on first use, see load_role
 import network_logic
-import teacher_qt as teacher
-import student_qt as student
-from teacher_qt import AnimatedBubbleButton, IconSquareButton, NU_BLUE
+from common_qt import AnimatedBubbleButton, IconSquareButton, NU_BLUE, get_data_path
+
+IMPORTS_DONE = time.perf_counter()
 
 
 def get_asset_path(filename):
@@ -22,29 +26,16 @@ def get_asset_path(filename):
     return os.path.join(base_path, filename)
 
 
-def get_data_path(subfolder):
-    """Get the correct path for data folders (exams, logs, classes) in proctora_data directory"""
-    if getattr(sys, 'frozen', False):
-        # Running as a PyInstaller bundle - use current working directory
-        base_path = os.getcwd()
-    else:
-        # Running from source - use script directory
-        base_path = os.path.dirname(os.path.abspath(__file__))
-    return os.path.join(base_path, 'proctora_data', subfolder)
+# Regular is needed for the first frame; the other weights load once the window is up
+STARTUP_FONTS = ['Poppins-Regular.ttf']
+DEFERRED_FONTS = ['Poppins-Medium.ttf', 'Poppins-Bold.ttf']
 
 
-def load_custom_fonts():
+def load_custom_fonts(poppins_fonts=STARTUP_FONTS):
     """Load Poppins fonts from the fonts directory"""
     font_dir = get_asset_path('fonts')
     loaded_fonts = []
     
-    # Try to load Poppins fonts
-    poppins_fonts = [
-        'Poppins-Regular.ttf',
-        'Poppins-Medium.ttf', 
-        'Poppins-Bold.ttf'
-    ]
-    
     for font_file in poppins_fonts:
         font_path = os.path.join(font_dir, font_file)
         if os.path.exists(font_path):
@@ -60,6 +51,27 @@ def load_custom_fonts():
     return loaded_fonts
 
 
+def load_role(name):
+    """Import teacher_qt or student_qt the first time that role is opened"""
+    module = sys.modules.get(name)
+    if module is None:
+        start = time.perf_counter()
+        module = importlib.import_module(name)
+        print(f"Loaded {name} in {(time.perf_counter() - start) * 1000:.0f} ms")
+    return module
+
+
+def report_startup(fonts_done, window_done):
+    """Print how long each startup phase took, then load the deferred fonts"""
+    shown = time.perf_counter()
+    def ms(a, b):
+        return f"{(b - a) * 1000:.0f} ms"
+    print(f"Startup: imports {ms(STARTED, IMPORTS_DONE)}, fonts {ms(IMPORTS_DONE, fonts_done)}, "
+          f"window {ms(fonts_done, window_done)}, first event {ms(window_done, shown)}, "
+          f"total {ms(STARTED, shown)}")
+    load_custom_fonts(DEFERRED_FONTS)
+
+
 class AntiCheatPortal(QMainWindow):
     """1. MAIN PORTAL - Central login and navigation window"""
     def __init__(self):
@@ -75,14 +87,40 @@ class AntiCheatPortal(QMainWindow):
         # 1.2 BACKGROUND LABEL - Display background image
         self.bg_label = QLabel(self)
         self.bg_label.setGeometry(0, 0, 900, 600)
-        self.show_opening_page()
-        
+
         self.active_teacher_ip = None 
+        self.active_teacher_id = None
+        self.teachers = []  # live teachers from the discovery registry
         self.server_started = False  
-        self.listener = network_logic.DiscoveryListener()
-        self.listener.teacher_found.connect(self.on_teacher_discovered)
+        self.listener = None  # started with the student sign-in page
+        self.show_opening_page()
+
+    def start_discovery(self):
+        """Listen for teacher beacons (again) unless a listener is already running"""
+        if self.listener is not None:
+            return
+        self.teachers = []
+        self.select_teacher(None)
+        self.listener = network_logic.DiscoveryListener(cache_path=get_data_path("last_teacher.json"))
+        self.listener.teachers_changed.connect(self.on_teachers_changed)
         self.listener.start()
 
+    def stop_discovery(self):
+        """Close the discovery socket and thread (teacher machines do not need them)"""
+        if self.listener is not None:
+            self.listener.teachers_changed.disconnect(self.on_teachers_changed)
+            self.listener.stop()
+            self.listener = None
+
+    def shutdown(self):
+        """App is quitting: stop discovery, the teacher server and the submission journal before Qt tears down"""
+        self.cancel_login()
+        self.stop_discovery()
+        self.stop_teacher_server()
+        # Only if the teacher role was ever opened; importing it now would start nothing worth stopping
+        if "teacher_qt" in sys.modules:
+            sys.modules["teacher_qt"].submission_journal.stop()
+
     def set_bg(self, img_path):
         """1.3 SET BACKGROUND - Load and scale background image"""
         pixmap = QPixmap(img_path)
@@ -95,6 +133,7 @@ class AntiCheatPortal(QMainWindow):
         # Prevent dangling references to widgets that will be deleted
         if getattr(self, 'status_label', None) is not None:
             self.status_label = None
+        self.teacher_picker = None
 
         # Preserve embedded student/teacher widgets so they are reusable
         preserve = set()
@@ -108,24 +147,73 @@ class AntiCheatPortal(QMainWindow):
                 continue
             child.deleteLater()
 
-    def on_teacher_discovered(self, info):
-        # Save active teacher address immediately
-        self.active_teacher_ip = info.get("ip")
-        # Defer UI update to the main thread to avoid touching deleted widgets
-        try:
-            QTimer.singleShot(0, lambda: self._apply_teacher_info(info))
-        except Exception:
-            pass
+    def on_teachers_changed(self, teachers):
+        """Discovery registry changed: keep the chosen teacher if it is still there, else pick the only one"""
+        known = {t["id"]: t["ip"] for t in self.teachers}
+        self.teachers = teachers
+        chosen = next((t for t in teachers if t["id"] == self.active_teacher_id), None)
+        if chosen is None and len(teachers) == 1:
+            chosen = teachers[0]
+        self.select_teacher(chosen)
+        # Submissions saved while their teacher was unreachable go out as soon as it is back
+        for t in teachers:
+            if known.get(t["id"]) != t["ip"]:
+                load_role("student_qt").submission_spool.teacher_seen(t["id"], t["ip"])
+        # A signed-in student follows their teacher to a new address
+        s_win = getattr(self, 's_win', None)
+        if s_win is not None:
+            current = next((t for t in teachers if t["id"] == s_win.teacher_id), None)
+            if current is not None:
+                s_win.teacher_ip = current["ip"]
+        self.refresh_teacher_status()
+
+    def select_teacher(self, teacher):
+        self.active_teacher_id = teacher["id"] if teacher else None
+        self.active_teacher_ip = teacher["ip"] if teacher else None
+
+    def on_teacher_picked(self, index):
+        if self.teacher_picker is None or index < 0:
+            return
+        teacher_id = self.teacher_picker.itemData(index)
+        self.select_teacher(next((t for t in self.teachers if t["id"] == teacher_id), None))
+        self.refresh_teacher_status()
 
-    def _apply_teacher_info(self, info):
+    def refresh_teacher_status(self):
+        """Status line and, when several teachers are on the network, the teacher picker"""
         try:
-            if hasattr(self, 'status_label') and getattr(self, 'status_label', None) is not None:
-                self.status_label.setText(f"Connected: {len(info.get('available_classes', []))} Classes Active")
+            if getattr(self, 'status_label', None) is None:
+                return
+            chosen = next((t for t in self.teachers if t["id"] == self.active_teacher_id), None)
+            if chosen is not None:
+                self.status_label.setText(f"Connected: {len(chosen.get('available_classes', []))} Classes Active")
                 self.status_label.setStyleSheet("color: #28a745; font-weight: bold;")
-        except Exception:
-            # Widget was likely deleted; ignore update
+            elif self.teachers:
+                self.status_label.setText(f"{len(self.teachers)} teachers found — choose yours")
+                self.status_label.setStyleSheet("color: #0B2C5D; font-weight: bold;")
+            else:
+                self.status_label.setText("Offline — No teacher detected")
+                self.status_label.setStyleSheet("color: #dc3545; font-style: italic; font-weight: bold;")
+
+            if self.teacher_picker is not None:
+                self.teacher_picker.blockSignals(True)
+                self.teacher_picker.clear()
+                if chosen is None:
+                    self.teacher_picker.addItem("Select your teacher / class...", None)
+                for t in self.teachers:
+                    classes = ", ".join(t.get("available_classes", [])) or "No classes"
+                    self.teacher_picker.addItem(f"{classes} — {t['ip']}", t["id"])
+                if chosen is not None:
+                    self.teacher_picker.setCurrentIndex(self.teacher_picker.findData(chosen["id"]))
+                self.teacher_picker.blockSignals(False)
+                self.teacher_picker.setVisible(len(self.teachers) > 1)
+        except RuntimeError:
+            # Widget was deleted with its page; ignore update
             pass
 
+    def on_classes_changed(self, classes):
+        if getattr(self, 'broadcaster', None) is not None:
+            self.broadcaster.set_class_list(classes)
+
     def stop_teacher_server(self):
         """Stop the broadcaster and server threads"""
         if getattr(self, 'broadcaster', None) is not None:
@@ -142,13 +230,20 @@ class AntiCheatPortal(QMainWindow):
                 pass
             self.server_thread = None
         
+        if self.server_started:
+            try:
+                load_role("teacher_qt").data_watcher.classes_changed.disconnect(self.on_classes_changed)
+            except TypeError:
+                pass
+        
+        # This machine's own beacon stops now; the discovery registry drops it once its TTL runs out
         self.server_started = False
-        self.active_teacher_ip = None
 
     def show_opening_page(self):
         """2. OPENING PAGE - Modernized UI with Logo and Coded Text"""
         # Stop teacher server/broadcaster if running
         self.stop_teacher_server()
+        self.cancel_login()
         
         self.clear_ui()
         # Instead of a heavy image, use a clean background or a simple logo
@@ -203,16 +298,26 @@ class AntiCheatPortal(QMainWindow):
         self.bg_label.setPixmap(QPixmap())
         self.bg_label.setStyleSheet("background-color: #F8DD70;")
 
+        # Teacher machines do not need to listen for other teachers
+        self.stop_discovery()
+
         if not self.server_started:
+            teacher = load_role("teacher_qt")
             # Start the Lighthouse (UDP) and the Server (TCP)
             classes = [f[:-5] for f in os.listdir(get_data_path("classes")) if f.endswith(".json")]
-            self.broadcaster = network_logic.TeacherBroadcaster(classes)
+            self.broadcaster = network_logic.TeacherBroadcaster(classes, server_id=teacher.server_id())
             self.broadcaster.start()
 
             self.server_thread = teacher.RequestHandler(self)
             self.server_thread.start()
             self.server_started = True
 
+            # Keep the beacon's class list current as classes are created or deleted
+            teacher.data_watcher.classes_changed.connect(self.on_classes_changed)
+            teacher.data_watcher.start()
+            # Live Monitor counters accumulate from server start, whether or not the page is open
+            teacher.live_monitor.start()
+
         # 3.0 ADD LOGO - Centered horizontally
         self.logo_teacher = QLabel(self)
         self.logo_teacher.setPixmap(QPixmap(get_asset_path("logo.png")).scaled(100, 100, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation))
@@ -226,12 +331,13 @@ class AntiCheatPortal(QMainWindow):
         self.teacher_title.setStyleSheet("font-size: 28px; font-weight: bold; color: #0B2C5D;")
         self.teacher_title.show()
 
-        # 3.1 MENU OPTIONS with Icon Square Buttons (1 Row, 4 Columns - Compact Professional)
+        # 3.1 MENU OPTIONS with Icon Square Buttons (1 Row, 5 Columns - Compact Professional)
         menu_options = [
-            ("Generate\nExam", "📝", 130, 240, "exam"),
-            ("View Exam\nLogs", "📊", 300, 240, "logs"),
-            ("Create New\nClass", "👥", 470, 240, "create_class"),
-            ("Manage\nClasses", "⚙️", 640, 240, "manage_class")
+            ("Generate\nExam", "📝", 65, 240, "exam"),
+            ("View Exam\nLogs", "📊", 225, 240, "logs"),
+            ("Live\nMonitor", "📡", 385, 240, "live"),
+            ("Create New\nClass", "👥", 545, 240, "create_class"),
+            ("Manage\nClasses", "⚙️", 705, 240, "manage_class")
         ]
 
         for text, icon, x, y, key in menu_options:
@@ -258,6 +364,7 @@ class AntiCheatPortal(QMainWindow):
         
         self.clear_ui()
         self.bg_label.setStyleSheet("background-color: #F8DD70;")
+        self.start_discovery()
 
         # 4.1 LOGO - Consistent size and positioning with teacher page
         self.logo_sm = QLabel(self)
@@ -276,14 +383,15 @@ class AntiCheatPortal(QMainWindow):
         self.status_label = QLabel(self)
         self.status_label.setGeometry(300, 180, 300, 30)
         self.status_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        # Show connected status if a teacher was discovered, otherwise show offline message
-        if self.active_teacher_ip:
-            self.on_teacher_discovered({"ip": self.active_teacher_ip, "available_classes": []})
-        else:
-            self.status_label.setText("Offline — No teacher detected")
-            self.status_label.setStyleSheet("color: #dc3545; font-style: italic; font-weight: bold;")
         self.status_label.show()
 
+        # Only shown when more than one teacher is on the network
+        self.teacher_picker = QComboBox(self)
+        self.teacher_picker.setGeometry(300, 210, 300, 28)
+        self.teacher_picker.setStyleSheet("background-color: #ffffff; border-radius: 4px; padding: 2px;")
+        self.teacher_picker.activated.connect(self.on_teacher_picked)
+        self.refresh_teacher_status()
+
         # 4.4 INPUTS
         self.name_entry = QLineEdit(self)
         self.name_entry.setPlaceholderText("Full Name")
@@ -324,7 +432,7 @@ class AntiCheatPortal(QMainWindow):
         self.bg_label.setStyleSheet("background-color: #F8DD70;")
         
         # Create embedded teacher widget
-        self.t_win = teacher.TeacherWindow(page, self)
+        self.t_win = load_role("teacher_qt").TeacherWindow(page, self)
         self.t_win.setParent(self)
         self.t_win.setGeometry(0, 0, 900, 600)
         self.t_win.show()
@@ -332,22 +440,38 @@ class AntiCheatPortal(QMainWindow):
     def launch_student(self):
         """CRITICAL FIX: Use network login and pass classname"""
         if not self.active_teacher_ip:
-            QMessageBox.warning(self, "Offline", "Waiting for teacher...")
+            if self.teachers:
+                QMessageBox.warning(self, "Choose Teacher", "Several teachers are online. Choose yours from the list first.")
+            else:
+                QMessageBox.warning(self, "Offline", "Waiting for teacher...")
             return
 
         n, p = self.name_entry.text().strip(), self.pass_entry.text().strip()
         
-        # Perform Network Login
-        resp = network_logic.network_request(self.active_teacher_ip, {
+        # Perform Network Login off the GUI thread; a second click replaces a login still in flight
+        self.cancel_login()
+        teacher_id, teacher_ip = self.active_teacher_id, self.active_teacher_ip
+        self.login_request = network_logic.client.request(teacher_ip, {
             "type": "LOGIN", "name": n, "password": p
-        })
+        }, lambda resp: self.on_login_response(n, teacher_id, teacher_ip, resp))
+
+    def cancel_login(self):
+        if getattr(self, 'login_request', None) is not None:
+            self.login_request.cancel()
+            self.login_request = None
 
+    def on_login_response(self, n, teacher_id, teacher_ip, resp):
+        self.login_request = None
         if resp.get("status") == "success":
+            student = load_role("student_qt")
+            # Discovery keeps running (it idles in select()): it flushes the submission spool when the
+            # teacher comes back and keeps the session pointed at the teacher's current address
             # Embed the student UI into this main window instead of opening a new top-level window
             # Reuse existing student widget if present
             if hasattr(self, 's_win') and self.s_win is not None:
                 self.s_win.student_name = n
-                self.s_win.teacher_ip = self.active_teacher_ip
+                self.s_win.teacher_ip = teacher_ip
+                self.s_win.teacher_id = teacher_id
                 self.s_win.student_class = resp.get("classname")
                 try:
                     self.s_win.refresh_exam_list()
@@ -358,7 +482,7 @@ class AntiCheatPortal(QMainWindow):
             else:
                 # Clear current UI and create embedded student widget
                 self.clear_ui()
-                self.s_win = student.StudentWindow(n, self.active_teacher_ip, self, resp["classname"])
+                self.s_win = student.StudentWindow(n, teacher_ip, self, resp["classname"], teacher_id)
                 self.s_win.setParent(self)
                 self.s_win.setGeometry(0, 0, 900, 600)
                 self.s_win.show()
@@ -371,6 +495,7 @@ if __name__ == "__main__":
     
     # Load custom fonts
     loaded_fonts = load_custom_fonts()
+    fonts_done = time.perf_counter()
     
     # Light Mode Stylesheet
     app.setStyle('Fusion')
@@ -503,5 +628,8 @@ if __name__ == "__main__":
     app.setStyleSheet(light_stylesheet)
     
     portal = AntiCheatPortal()
+    app.aboutToQuit.connect(portal.shutdown)
     portal.show()
+    window_done = time.perf_counter()
+    QTimer.singleShot(0, lambda: report_startup(fonts_done, window_done))
     sys.exit(app.exec())
\ No newline at end of file
@@ -6,7 +6,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('logo.png', '.'), ('fonts', 'fonts'), ('proctora_data', 'proctora_data')],
-    hiddenimports=[],
+    hiddenimports=['teacher_qt', 'student_qt'],  # imported lazily by main_qt.load_role
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
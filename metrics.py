@@ -0,0 +1,146 @@
+"""Request metrics for the teacher's server.
+
+Per request type: counts, failures, bytes in/out and a latency histogram;
+plus error counts by cause and the number of open student connections.
+All recording methods are thread-safe and cheap enough to call per request.
+"""
+import json
+import math
+import threading
+import time
+from collections import Counter
+
+
+class LatencyHistogram:
+    """Fixed log-spaced buckets, each 10% wider than the last, from 50 µs up to about two minutes.
+
+    Percentiles are reported as the upper bound of the bucket they fall in,
+    so they are accurate to within 10% whatever the number of samples.
+    """
+    FIRST = 50e-6
+    GROWTH = 1.1
+    BUCKETS = 160
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        if seconds <= self.FIRST:
+            i = 0
+        else:
+            i = min(self.BUCKETS - 1, math.ceil(math.log(seconds / self.FIRST, self.GROWTH)))
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, p):
+        if not self.count:
+            return None
+        target = max(1, math.ceil(self.count * p / 100))
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return min(self.FIRST * self.GROWTH ** i, self.max)
+        return self.max
+
+    def summary(self):
+        """Milliseconds, rounded: p50/p95/p99, mean and max"""
+        def ms(seconds):
+            return None if seconds is None else round(seconds * 1000, 3)
+        return {
+            "p50_ms": ms(self.percentile(50)),
+            "p95_ms": ms(self.percentile(95)),
+            "p99_ms": ms(self.percentile(99)),
+            "mean_ms": ms(self.sum / self.count) if self.count else None,
+            "max_ms": ms(self.max) if self.count else None,
+        }
+
+
+class _TypeStats:
+    __slots__ = ("count", "failures", "bytes_in", "bytes_out", "latency")
+
+    def __init__(self):
+        self.count = 0
+        self.failures = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.latency = LatencyHistogram()
+
+
+class ServerMetrics:
+    """Counters and latency histograms for one run of the request server"""
+
+    def __init__(self, request_types=None):
+        # Types kept apart; any other (client-supplied) type is pooled under "unknown" so it cannot grow the table
+        self.request_types = frozenset(request_types) if request_types is not None else None
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self._types = {}
+        self._errors = Counter()
+        self.active_connections = 0
+        self.peak_connections = 0
+
+    def record(self, req_type, seconds, bytes_in, bytes_out, failed=False):
+        """One answered request: service time, frame sizes (headers included) and whether it was refused"""
+        if self.request_types is not None and req_type not in self.request_types:
+            req_type = "unknown"
+        with self._lock:
+            stats = self._types.get(req_type)
+            if stats is None:
+                stats = self._types[req_type] = _TypeStats()
+            stats.count += 1
+            stats.failures += failed
+            stats.bytes_in += bytes_in
+            stats.bytes_out += bytes_out
+            stats.latency.add(seconds)
+
+    def error(self, cause):
+        """Count a failure by cause, e.g. 'timeout', 'protocol', 'handler:KeyError'"""
+        with self._lock:
+            self._errors[cause] += 1
+
+    def set_connections(self, n):
+        self.active_connections = n
+        if n > self.peak_connections:
+            self.peak_connections = n
+
+    def snapshot(self):
+        """Everything as a JSON-ready dict"""
+        with self._lock:
+            requests = {}
+            totals = {"count": 0, "failures": 0, "bytes_in": 0, "bytes_out": 0}
+            overall = LatencyHistogram()
+            for req_type, stats in sorted(self._types.items()):
+                requests[req_type] = {"count": stats.count, "failures": stats.failures,
+                                      "bytes_in": stats.bytes_in, "bytes_out": stats.bytes_out,
+                                      **stats.latency.summary()}
+                totals["count"] += stats.count
+                totals["failures"] += stats.failures
+                totals["bytes_in"] += stats.bytes_in
+                totals["bytes_out"] += stats.bytes_out
+                overall.counts = [a + b for a, b in zip(overall.counts, stats.latency.counts)]
+                overall.count += stats.latency.count
+                overall.sum += stats.latency.sum
+                overall.max = max(overall.max, stats.latency.max)
+            totals.update(overall.summary())
+            errors = dict(self._errors)
+        now = time.time()
+        return {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now)),
+            "uptime_sec": round(now - self.started, 1),
+            "active_connections": self.active_connections,
+            "peak_connections": self.peak_connections,
+            "totals": totals,
+            "requests": requests,
+            "errors": errors,
+        }
+
+    def dump(self, path):
+        """Append the current snapshot to a JSON-lines file"""
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(self.snapshot(), ensure_ascii=False, separators=(",", ":")) + "\n")
@@ -1,60 +1,577 @@
 import socket
 import json
+import itertools
+import os
+import queue
+import random
+import select
+import struct
 import threading
-from PyQt6.QtCore import QThread, pyqtSignal
+import time
+import uuid
+import zlib
+import storage
+from concurrent.futures import ThreadPoolExecutor
+from PyQt6.QtCore import QObject, QThread, pyqtSignal
 
-UDP_PORT = 5554
+UDP_PORT = 5554   # students listen here for beacons and probe replies
 TCP_PORT = 5555
+PROBE_PORT = 5553  # teachers listen here for probes
+MULTICAST_GROUP = "239.255.55.53"  # probe fallback for networks that filter broadcast
+
+# TCP wire format: 4-byte big-endian body length, 4-byte request id, then a UTF-8 JSON body.
+# The server echoes the request id so a pooled connection can match replies to requests.
+MAX_MESSAGE_SIZE = 16 * 1024 * 1024
+_HEADER = struct.Struct("!II")
+HEADER_SIZE = _HEADER.size
+
+class ProtocolError(Exception):
+    """Raised when a peer sends a frame that breaks the wire format"""
+
+def encode_message(obj):
+    """Serialize a message body (compact JSON, UTF-8)"""
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode('utf-8')
+
+def send_frame(sock, body, request_id=0):
+    """Send an already-encoded body with its header"""
+    if len(body) > MAX_MESSAGE_SIZE:
+        raise ProtocolError(f"message of {len(body)} bytes exceeds the {MAX_MESSAGE_SIZE} byte limit")
+    sock.sendall(_HEADER.pack(len(body), request_id) + body)
+
+def send_message(sock, obj, request_id=0):
+    send_frame(sock, encode_message(obj), request_id)
+
+def _recv_exact(sock, size, allow_eof=False):
+    """Read exactly `size` bytes, looping over partial reads"""
+    buf = bytearray(size)
+    view = memoryview(buf)
+    got = 0
+    while got < size:
+        n = sock.recv_into(view[got:], size - got)
+        if n == 0:
+            if allow_eof and got == 0:
+                return None
+            raise ConnectionError("connection closed in the middle of a message")
+        got += n
+    return bytes(buf)
+
+def recv_frame(sock):
+    """Read one frame as (request_id, body bytes); None if the peer closed cleanly between messages"""
+    header = _recv_exact(sock, _HEADER.size, allow_eof=True)
+    if header is None:
+        return None
+    length, request_id = _HEADER.unpack(header)
+    if length > MAX_MESSAGE_SIZE:
+        raise ProtocolError(f"message of {length} bytes exceeds the {MAX_MESSAGE_SIZE} byte limit")
+    return request_id, _recv_exact(sock, length)
+
+def recv_message(sock):
+    """Read one frame as (request_id, decoded JSON); None if the peer closed cleanly"""
+    frame = recv_frame(sock)
+    if frame is None:
+        return None
+    request_id, body = frame
+    return request_id, json.loads(body.decode('utf-8'))
+
+def roster_version(class_list):
+    """Short fingerprint of a class list; beacons carry it instead of the list itself"""
+    return format(zlib.crc32(json.dumps(sorted(class_list)).encode('utf-8')), "08x")
+
+class TeacherRegistry:
+    """Teachers currently announcing themselves, keyed by server id; entries expire after TTL seconds of silence"""
+    TTL = 16  # a bit over three slow heartbeats
+
+    def __init__(self, ttl=TTL):
+        self.ttl = ttl
+        self._teachers = {}
+
+    @staticmethod
+    def key(info):
+        return info.get("id") or info["ip"]
+
+    def is_current(self, info, now):
+        """True if this beacon only confirms what is already known (same roster version, address in use)"""
+        entry = self._teachers.get(self.key(info))
+        if entry is None or entry["v"] is None or entry["v"] != info.get("v"):
+            return False
+        # The same teacher heard on another address (broadcast vs. static IP): keep the one in use while it is fresh
+        return entry["ip"] == info["ip"] or now - entry["last_seen"] < self.ttl / 2
+
+    def touch(self, info, now):
+        """Refresh a teacher heard on the address in use; False if the beacon came from another address"""
+        entry = self._teachers[self.key(info)]
+        if entry["ip"] != info["ip"]:
+            return False
+        entry["last_seen"] = now
+        return True
+
+    def update(self, info, classes, now):
+        """Record a new teacher, or a new address/roster for a known one; classes=None if the roster fetch failed"""
+        key = self.key(info)
+        old = self._teachers.get(key)
+        ip = info["ip"]
+        if old is not None and old["ip"] != ip and now - old["last_seen"] < self.ttl / 2:
+            ip = old["ip"]
+        entry = {"id": key, "ip": ip, "v": info.get("v") if classes is not None else None,
+                 "available_classes": classes if classes is not None else (old or {}).get("available_classes", []),
+                 "last_seen": now if ip == info["ip"] else old["last_seen"]}
+        self._teachers[key] = entry
+        return old is None or (old["ip"], old["available_classes"]) != (entry["ip"], entry["available_classes"])
+
+    def next_expiry(self):
+        """Monotonic time at which the next teacher would expire, or None if none are known"""
+        if not self._teachers:
+            return None
+        return min(entry["last_seen"] for entry in self._teachers.values()) + self.ttl
+
+    def expire(self, now):
+        stale = [key for key, entry in self._teachers.items() if now - entry["last_seen"] > self.ttl]
+        for key in stale:
+            del self._teachers[key]
+        return bool(stale)
+
+    def teachers(self):
+        """Live teachers as dicts (id, ip, available_classes), ordered by address"""
+        return [{k: v for k, v in entry.items() if k not in ("v", "last_seen")}
+                for entry in sorted(self._teachers.values(), key=lambda e: e["ip"])]
 
 class DiscoveryListener(QThread):
-    """Student portal uses this to find the Teacher automatically"""
-    teacher_found = pyqtSignal(dict)
+    """Student portal uses this to find the Teacher automatically (beacons, probes and a registry of live teachers)"""
+    PROBE_RETRY_MIN = 0.5
+    PROBE_RETRY_MAX = 5.0
+    LAST_TEACHER_TTL = 3600  # seconds a remembered teacher address is still worth probing
+    REMEMBER_REFRESH = 300   # seconds between rewrites of the cache for a teacher still in use
+    SOURCE_RATE = 20         # datagrams per second allowed from one address (token bucket)
+    SOURCE_BURST = 40
+    MAX_PARSE_FAILURES = 20  # undecodable datagrams from one address before it is muted
+    MUTE_SECONDS = 60
+    MAX_SOURCES = 1024       # tracked addresses; the table is reset beyond this
+
+    teachers_changed = pyqtSignal(list)
+
+    def __init__(self, cache_path=None, static_ips=None):
+        super().__init__()
+        self.cache_path = cache_path
+        if static_ips is None:
+            static_ips = [ip.strip() for ip in os.environ.get("PROCTORA_TEACHER_IP", "").split(",") if ip.strip()]
+        self.static_ips = list(static_ips)
+        self._rosters = {}  # (ip, server id) -> (roster version, class list)
+        self._remembered = None  # (ip, server id) last written to the cache file
+        self._remembered_at = 0.0
+        self._found = False
+        self.registry = TeacherRegistry()
+        self._sources = {}  # ip -> [tokens, last refill, parse failures, muted until]
+        self._fetching = {}  # (ip, server id) -> PendingRequest for GET_CLASS_LIST
+        self._fetched = queue.SimpleQueue()  # (beacon, response) from the AsyncClient
+        self.running = True
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+
+    def _wake(self):
+        try:
+            self._wake_w.send(b"\0")
+        except OSError:
+            pass  # already closed, or the wake buffer is full and a wake-up is pending anyway
+
+    def stop(self):
+        """Close the discovery socket and end the thread"""
+        self.running = False
+        self._wake()
+        if self.isRunning():
+            self.wait(2000)
+
+    def _admit(self, ip, now):
+        """Token bucket per source address; False while the source is over its rate or muted"""
+        if len(self._sources) > self.MAX_SOURCES:
+            self._sources.clear()
+        state = self._sources.get(ip)
+        if state is None:
+            state = self._sources[ip] = [self.SOURCE_BURST, now, 0, 0]
+        if now < state[3]:
+            return False
+        state[0] = min(self.SOURCE_BURST, state[0] + (now - state[1]) * self.SOURCE_RATE)
+        state[1] = now
+        if state[0] < 1:
+            return False
+        state[0] -= 1
+        return True
+
+    def _parse_failed(self, ip, now):
+        state = self._sources[ip]
+        state[2] += 1
+        if state[2] >= self.MAX_PARSE_FAILURES:
+            print(f"Ignoring discovery traffic from {ip} for {self.MUTE_SECONDS}s (undecodable datagrams)")
+            state[2], state[3] = 0, now + self.MUTE_SECONDS
+
+    def _fetch_class_list(self, info):
+        """Ask for the class list of a beacon's new roster version; the reply is picked up by _class_list_fetched"""
+        key = (info["ip"], info.get("id"))
+        if key in self._fetching:
+            return
+
+        def on_response(resp):
+            self._fetched.put((info, resp))
+            self._wake()
+        self._fetching[key] = client.request(info["ip"], {"type": "GET_CLASS_LIST"}, on_response, timeout=2)
+
+    def _class_list_fetched(self, now):
+        while True:
+            try:
+                info, resp = self._fetched.get_nowait()
+            except queue.Empty:
+                return
+            key = (info["ip"], info.get("id"))
+            self._fetching.pop(key, None)
+            classes = None
+            if resp.get("status") == "success":
+                self._rosters[key] = (resp.get("version"), resp.get("classes", []))
+                classes = self._rosters[key][1]
+            self._record(info, classes, now)
+
+    def _record(self, info, classes, now):
+        """A teacher's beacon with its class list (None if the fetch failed) goes into the registry"""
+        self._remember(info)
+        if self.registry.update(info, classes, now):
+            self.teachers_changed.emit(self.registry.teachers())
+
+    def _last_teacher(self):
+        if not self.cache_path:
+            return None
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                last = json.load(f)
+            if time.time() - last.get("seen", 0) < self.LAST_TEACHER_TTL:
+                return last.get("ip")
+        except (OSError, ValueError, AttributeError):
+            pass
+        return None
+
+    def _remember(self, info):
+        """Cache the teacher's address for the next start; an unchanged one is rewritten only to keep it fresh"""
+        now = time.monotonic()
+        if not self.cache_path or (self._remembered == (info["ip"], info.get("id"))
+                                   and now - self._remembered_at < self.REMEMBER_REFRESH):
+            return
+        self._remembered = (info["ip"], info.get("id"))
+        self._remembered_at = now
+        try:
+            storage.write_json(self.cache_path, {"ip": info["ip"], "id": info.get("id"), "seen": time.time()})
+        except OSError:
+            pass
+
+    def _probe(self, sock):
+        targets = ['<broadcast>', MULTICAST_GROUP] + self.static_ips
+        last = self._last_teacher()
+        if last and last not in targets:
+            targets.append(last)
+        probe = encode_message({"type": "PROCTORA_PROBE"})
+        for host in targets:
+            try:
+                sock.sendto(probe, (host, PROBE_PORT))
+            except OSError:
+                pass
 
     def run(self):
         sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        sock.bind(('', UDP_PORT))
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+        sock.setblocking(False)
+        try:
+            sock.bind(('', UDP_PORT))
+            delay = self.PROBE_RETRY_MIN
+            self._probe(sock)
+            next_probe = time.monotonic() + delay
+            while self.running:
+                # Sleep until a datagram arrives or the next probe / expiry is due; forever if neither is
+                deadlines = [d for d in (None if self._found else next_probe, self.registry.next_expiry()) if d is not None]
+                timeout = max(0, min(deadlines) - time.monotonic()) if deadlines else None
+                ready, _, _ = select.select([sock, self._wake_r], [], [], timeout)
+                now = time.monotonic()
+                if self._wake_r in ready:
+                    try:
+                        self._wake_r.recv(4096)
+                    except OSError:
+                        pass
+                    if not self.running:
+                        break
+                    self._class_list_fetched(now)
+                if not self._found and now >= next_probe:
+                    # Nobody answered yet: probe again, less often each time
+                    delay = min(self.PROBE_RETRY_MAX, delay * 2)
+                    self._probe(sock)
+                    next_probe = now + delay
+                if self.registry.expire(now):
+                    self.teachers_changed.emit(self.registry.teachers())
+                if sock in ready:
+                    self._receive(sock, now)
+        except OSError as e:
+            print(f"Discovery stopped: {e}")
+        finally:
+            for pending in self._fetching.values():
+                pending.cancel()
+            self._fetching.clear()
+            sock.close()
+            self._wake_r.close()
+            self._wake_w.close()
+
+    def _receive(self, sock, now):
+        """Handle every datagram queued on the socket"""
         while True:
             try:
                 data, addr = sock.recvfrom(1024)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return  # e.g. ICMP port unreachable reported for an earlier probe
+            ip = addr[0]
+            if not self._admit(ip, now):
+                continue
+            try:
                 info = json.loads(data.decode('utf-8'))
-                if info.get("type") == "PROCTORA_BROADCAST":
-                    info["ip"] = addr[0]
-                    self.teacher_found.emit(info)
-            except: continue
+                kind = info.get("type")
+            except (ValueError, AttributeError):
+                self._parse_failed(ip, now)
+                continue
+            if kind not in ("PROCTORA_BROADCAST", "PROCTORA_REPLY"):
+                continue  # probes from other students, other apps on the port
+            info["ip"] = ip
+            self._found = True
+            if self.registry.is_current(info, now):
+                if self.registry.touch(info, now):
+                    self._remember(info)
+                continue
+            if isinstance(info.get("available_classes"), list):
+                self._record(info, info["available_classes"], now)
+                continue
+            cached = self._rosters.get((ip, info.get("id")))
+            if cached is not None and cached[0] == info.get("v"):
+                self._record(info, cached[1], now)
+            else:
+                self._fetch_class_list(info)
 
 class TeacherBroadcaster(threading.Thread):
-    """Teacher app shouts 'I am here' and lists all available classes"""
-    def __init__(self, class_list):
+    """Teacher app shouts 'I am here' with a small beacon (server id, roster version) and answers probes"""
+    FAST_INTERVAL = 0.25
+    SLOW_INTERVAL = 5.0
+    BACKOFF = 2
+
+    def __init__(self, class_list, server_id=None):
         super().__init__()
-        self.class_list = class_list
+        self.server_id = server_id or uuid.uuid4().hex[:12]
         self.running = True
         self.daemon = True
+        # The thread sleeps in select() on the probe socket, so it is woken through a socket too
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self.set_class_list(class_list)
 
     def stop(self):
         """Stop the broadcaster thread"""
         self.running = False
+        self._wake()
+
+    def _wake(self):
+        try:
+            self._wake_w.send(b"\0")
+        except OSError:
+            pass
+
+    def set_class_list(self, class_list):
+        """Advertise a new class list (by version) and go back to fast beacons"""
+        self.class_list = list(class_list)
+        self.roster_version = roster_version(self.class_list)
+        self._interval = self.FAST_INTERVAL
+        self._next_beacon = 0
+        self._wake()
+
+    def _beacon(self, kind):
+        return encode_message({"type": kind, "id": self.server_id, "v": self.roster_version})
 
     def run(self):
         sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-        message = json.dumps({
-            "type": "PROCTORA_BROADCAST",
-            "available_classes": self.class_list 
-        }).encode('utf-8')
-        while self.running:
-            sock.sendto(message, ('<broadcast>', UDP_PORT))
-            threading.Event().wait(2)
-
-def network_request(ip, request_dict):
+        watched = [self._wake_r]
+        try:
+            sock.bind(('', PROBE_PORT))
+            watched.append(sock)
+        except OSError as e:
+            # Another program holds the probe port: keep beaconing, students just wait for a beacon
+            print(f"Probe replies unavailable: {e}")
+        else:
+            try:
+                sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP,
+                                socket.inet_aton(MULTICAST_GROUP) + socket.inet_aton("0.0.0.0"))
+            except OSError as e:
+                print(f"Multicast discovery unavailable: {e}")
+        try:
+            while self.running:
+                now = time.monotonic()
+                if now >= self._next_beacon:
+                    try:
+                        sock.sendto(self._beacon("PROCTORA_BROADCAST"), ('<broadcast>', UDP_PORT))
+                    except OSError as e:
+                        print(f"Beacon not sent: {e}")
+                    self._next_beacon = now + self._interval
+                    self._interval = min(self.SLOW_INTERVAL, self._interval * self.BACKOFF)
+                ready, _, _ = select.select(watched, [], [], max(0, self._next_beacon - now))
+                if self._wake_r in ready:
+                    try:
+                        while self._wake_r.recv(512): pass
+                    except (BlockingIOError, InterruptedError):
+                        pass
+                if sock in ready:
+                    try:
+                        data, addr = sock.recvfrom(1024)
+                        if json.loads(data.decode('utf-8')).get("type") == "PROCTORA_PROBE":
+                            sock.sendto(self._beacon("PROCTORA_REPLY"), addr)
+                    except (OSError, ValueError, AttributeError):
+                        pass
+        finally:
+            sock.close()
+            self._wake_r.close()
+            self._wake_w.close()
+
+class ConnectionPool:
+    """Keeps TCP connections to each teacher open between requests"""
+    MAX_IDLE_PER_HOST = 4
+    IDLE_TIMEOUT = 30  # seconds; the teacher drops sessions idle for longer than this
+
+    def __init__(self):
+        self._idle = {}  # ip -> [(sock, last_used), ...]
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def _acquire(self, ip, timeout, fresh=False):
+        """Return (sock, reused): a pooled connection if one is fresh enough (and fresh is not set), otherwise a new one"""
+        now = time.monotonic()
+        with self._lock:
+            idle = [] if fresh else self._idle.get(ip, [])
+            while idle:
+                sock, last_used = idle.pop()
+                if now - last_used < self.IDLE_TIMEOUT:
+                    sock.settimeout(timeout)
+                    return sock, True
+                sock.close()
+        sock = socket.create_connection((ip, TCP_PORT), timeout=timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock, False
+
+    def _release(self, ip, sock):
+        with self._lock:
+            idle = self._idle.setdefault(ip, [])
+            if len(idle) < self.MAX_IDLE_PER_HOST:
+                idle.append((sock, time.monotonic()))
+                return
+        sock.close()
+
+    def request(self, ip, request_dict, timeout=3):
+        """Send one request and return the decoded reply; raises on network or protocol errors"""
+        body = encode_message(request_dict)
+        for attempt in range(2):
+            sock, reused = self._acquire(ip, timeout, fresh=attempt > 0)
+            request_id = next(self._ids) & 0xFFFFFFFF
+            try:
+                send_frame(sock, body, request_id)
+                reply = recv_frame(sock)
+                if reply is None:
+                    raise ConnectionError("teacher closed the connection without replying")
+                reply_id, reply_body = reply
+                if reply_id != request_id:
+                    raise ProtocolError(f"reply for request {reply_id} arrived while waiting for {request_id}")
+            except (OSError, ProtocolError) as e:
+                sock.close()
+                # A pooled socket may have been dropped by the teacher while idle (or the teacher restarted,
+                # in which case its other idle sockets are dead too): drop them all and retry once on a new
+                # connection, but never after a timeout, when the request may have been handled.
+                if reused and attempt == 0 and not isinstance(e, TimeoutError):
+                    self.close(ip)
+                    continue
+                raise
+            self._release(ip, sock)
+            return json.loads(reply_body.decode('utf-8'))
+
+    def close(self, ip=None):
+        """Close idle connections to one teacher, or to all of them"""
+        with self._lock:
+            ips = [ip] if ip is not None else list(self._idle)
+            for key in ips:
+                for sock, _ in self._idle.pop(key, []):
+                    sock.close()
+
+_pool = ConnectionPool()
+
+def network_request(ip, request_dict, timeout=3):
     """Universal TCP requester for login and data fetching"""
     try:
-        client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        client.settimeout(3)
-        client.connect((ip, TCP_PORT))
-        client.send(json.dumps(request_dict).encode('utf-8'))
-        response = client.recv(1024 * 100).decode('utf-8') 
-        client.close()
-        return json.loads(response)
-    except:
-        return {"status": "error", "message": "Teacher disconnected"}
\ No newline at end of file
+        return _pool.request(ip, request_dict, timeout)
+    except (OSError, ValueError, ProtocolError) as e:
+        # retryable marks transport failures, as opposed to a request the teacher answered with an error
+        return {"status": "error", "message": f"Teacher disconnected ({e})", "retryable": True}
+
+class PendingRequest:
+    """Handle for one queued request; cancel() drops its callback (and the send, if it has not started)"""
+    def __init__(self, callback):
+        self.callback = callback
+        self.cancelled = False
+        self.future = None
+
+    def cancel(self):
+        self.cancelled = True
+        if self.future is not None:
+            self.future.cancel()
+
+    def done(self):
+        return self.future is not None and self.future.done()
+
+class AsyncClient(QObject):
+    """network_request() off the GUI thread; callbacks run on the GUI thread with the response dict"""
+    MAX_WORKERS = 4
+
+    _completed = pyqtSignal(object, object)  # PendingRequest, response
+
+    def __init__(self, max_workers=MAX_WORKERS):
+        super().__init__()
+        self.max_workers = max_workers
+        self._executor = None
+        self._executor_lock = threading.Lock()  # requests come from the GUI thread and the discovery thread
+        # Connected to a method of this object, so delivery is queued onto the thread it lives in
+        self._completed.connect(self._deliver)
+
+    def request(self, ip, request_dict, callback=None, timeout=3):
+        """Queue a request; returns a PendingRequest"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="student-net")
+        handle = PendingRequest(callback)
+        handle.future = self._executor.submit(self._run, handle, ip, request_dict, timeout)
+        return handle
+
+    def _run(self, handle, ip, request_dict, timeout):
+        if handle.cancelled:
+            return
+        self._completed.emit(handle, network_request(ip, request_dict, timeout))
+
+    def _deliver(self, handle, resp):
+        if not handle.cancelled and handle.callback is not None:
+            handle.callback(resp)
+
+client = AsyncClient()
+
+class Backoff:
+    """Exponential backoff with full jitter, so a room of clients does not retry in lockstep"""
+    def __init__(self, base=1.0, cap=60.0):
+        self.base = base
+        self.cap = cap
+        self.failures = 0
+
+    def next_delay(self):
+        """Seconds to wait before the next attempt; each call counts one more failure"""
+        # The exponent is clamped so an absent teacher can be retried for days without overflowing
+        delay = random.uniform(0, min(self.cap, self.base * 2 ** min(self.failures, 32)))
+        self.failures += 1
+        return delay
+
+    def reset(self):
+        self.failures = 0
@@ -0,0 +1,723 @@
+"""Teacher-side access to proctora_data: in-memory indexes over the JSON files.
+
+Everything here is shared between the request server thread and the teacher
+UI, so every public method is thread-safe.
+"""
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+_file_locks = {}
+_file_locks_guard = threading.Lock()
+
+
+def file_lock(path):
+    """The lock that serializes writers of one data file, across server workers and the UI"""
+    path = os.path.abspath(path)
+    with _file_locks_guard:
+        lock = _file_locks.get(path)
+        if lock is None:
+            lock = _file_locks[path] = threading.RLock()
+        return lock
+
+
+def _fsync_dir(directory):
+    """Persist a rename; directories cannot be opened for this on Windows, where it is skipped"""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_json(path, data):
+    """Replace a JSON file atomically (temp file + fsync + rename), compactly encoded.
+
+    Readers see either the previous file or the new one, never a torn write, so
+    they need no lock. The temp name does not end in .json, so folder scans skip it.
+    """
+    body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    directory = os.path.dirname(os.path.abspath(path))
+    with file_lock(path):
+        fd, tmp = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(body)
+                f.flush()
+                os.fsync(f.fileno())
+            for attempt in range(5):
+                try:
+                    os.replace(tmp, path)
+                    break
+                except PermissionError:
+                    # Windows refuses to replace a file another thread has open for reading
+                    if attempt == 4:
+                        raise
+                    time.sleep(0.02)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        _fsync_dir(directory)
+
+
+def update_json(path, mutate):
+    """Read-modify-write a JSON file under its lock; mutate(data) edits in place. Returns the new data"""
+    with file_lock(path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        mutate(data)
+        write_json(path, data)
+        return data
+
+
+def remove_file(path):
+    """Delete a data file without racing a concurrent write_json() to it"""
+    with file_lock(path):
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+
+class RosterIndex:
+    """Constant-time LOGIN lookups over every class roster.
+
+    Keeps (name, password) -> classname for all files in the classes folder.
+    The teacher UI calls reload()/remove() right after it changes a roster;
+    edits made behind the app's back are picked up by comparing file mtimes,
+    which happens at most once every RESCAN_INTERVAL seconds.
+    """
+    RESCAN_INTERVAL = 2.0
+
+    def __init__(self, classes_dir):
+        self.classes_dir = classes_dir
+        self._lock = threading.Lock()
+        self._files = {}        # filename -> (mtime_ns, size, classname, [(name, password), ...])
+        self._credentials = {}  # (name, password) -> classname
+        self._last_scan = 0.0
+
+    def lookup(self, name, password):
+        """Return the class a student belongs to, or None if the credentials match no roster"""
+        with self._lock:
+            if time.monotonic() - self._last_scan >= self.RESCAN_INTERVAL:
+                self._scan()
+            return self._credentials.get((name, password))
+
+    def refresh(self):
+        """Rescan the whole folder now (only files whose mtime changed are re-parsed)"""
+        with self._lock:
+            self._scan()
+
+    def reload(self, classname):
+        """Re-read one class file after the app has written it"""
+        filename = f"{classname}.json"
+        with self._lock:
+            self._files.pop(filename, None)
+            self._load(filename)
+            self._rebuild()
+
+    def remove(self, classname):
+        """Forget a class whose file the app has deleted"""
+        with self._lock:
+            if self._files.pop(f"{classname}.json", None) is not None:
+                self._rebuild()
+
+    def _scan(self):
+        self._last_scan = time.monotonic()
+        try:
+            entries = {e.name: e.stat() for e in os.scandir(self.classes_dir)
+                       if e.is_file() and e.name.endswith(".json")}
+        except FileNotFoundError:
+            entries = {}
+
+        changed = False
+        for filename in list(self._files):
+            if filename not in entries:
+                del self._files[filename]
+                changed = True
+        for filename, st in entries.items():
+            cached = self._files.get(filename)
+            if cached is None or cached[:2] != (st.st_mtime_ns, st.st_size):
+                changed |= self._load(filename, st)
+        if changed:
+            self._rebuild()
+
+    def _load(self, filename, st=None):
+        """Parse one roster file into self._files; returns False if it could not be read"""
+        path = os.path.join(self.classes_dir, filename)
+        try:
+            if st is None:
+                st = os.stat(path)
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            # Keep whatever we had before; a half-written file is retried on the next scan
+            print(f"Roster index: could not read {filename}: {e}")
+            return False
+        students = [(s["name"], s["password"]) for s in data.get("students", []) if "name" in s and "password" in s]
+        self._files[filename] = (st.st_mtime_ns, st.st_size, data.get("classname", filename[:-5]), students)
+        return True
+
+    def _rebuild(self):
+        credentials = {}
+        # Sorted so a student listed in two classes with the same password always lands in the same one
+        for filename in sorted(self._files):
+            classname, students = self._files[filename][2:]
+            for key in students:
+                credentials.setdefault(key, classname)
+        self._credentials = credentials
+
+
+class ExamCache:
+    """Parsed exams plus whatever the server derives from them.
+
+    `prepare(exam)` runs once per exam version (the server uses it to build the
+    encoded GET_EXAM reply and the compiled answer key), so repeat requests
+    cost neither a file read nor a JSON encode. Entries are dropped
+    by invalidate() when the teacher saves or deletes an exam, and re-checked
+    against the file's mtime at most once every REVALIDATE_INTERVAL seconds.
+    """
+    REVALIDATE_INTERVAL = 2.0
+    MAX_ENTRIES = 64
+
+    def __init__(self, exams_dir, prepare):
+        self.exams_dir = exams_dir
+        self.prepare = prepare
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # exam name -> [mtime_ns, size, checked_at, exam, prepared]
+
+    def get(self, exam_name):
+        """Return (exam, prepare(exam)) for an exam, or (None, None) if it does not exist; other read errors raise"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(exam_name)
+            if entry is not None and now - entry[2] < self.REVALIDATE_INTERVAL:
+                self._entries.move_to_end(exam_name)
+                return entry[3], entry[4]
+
+            path = os.path.join(self.exams_dir, f"{exam_name}.json")
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                self._entries.pop(exam_name, None)
+                return None, None
+            if entry is not None and entry[:2] == [st.st_mtime_ns, st.st_size]:
+                entry[2] = now
+                self._entries.move_to_end(exam_name)
+                return entry[3], entry[4]
+
+            with open(path, "r", encoding="utf-8") as f:
+                exam = json.load(f)
+            entry = [st.st_mtime_ns, st.st_size, now, exam, self.prepare(exam)]
+            self._entries[exam_name] = entry
+            self._entries.move_to_end(exam_name)
+            while len(self._entries) > self.MAX_ENTRIES:
+                self._entries.popitem(last=False)
+            return exam, entry[4]
+
+    def invalidate(self, exam_name=None):
+        """Drop one exam (or everything) so the next request re-reads it from disk"""
+        with self._lock:
+            if exam_name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(exam_name, None)
+
+
+class DetectionLog:
+    """Append-only detection streams, one JSON-lines file per exam attempt.
+
+    Students push small batches during the exam; each batch carries a sequence
+    number so a retried batch is written only once. Lines are flushed to the
+    OS right away (they survive an app crash) and fsynced in batches: after
+    FSYNC_EVERY lines, or by sync_pending(), which the server calls about once
+    a second.
+    """
+    FSYNC_EVERY = 64
+    MAX_OPEN = 512          # above the seats in a lab, so batches do not evict each other's handles
+    MAX_TRACKED_SEQ = 4096  # remembered last seqs; a forgotten one is re-read from its file
+
+    def __init__(self, events_dir):
+        self.events_dir = events_dir
+        self._lock = threading.Lock()
+        self._open = OrderedDict()      # path -> [file, unsynced_lines]
+        self._last_seq = OrderedDict()  # path -> highest batch seq written
+        self._evicted_unsynced = set()  # closed by eviction with lines not yet fsynced
+
+    _ATTEMPT_ID = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+    @classmethod
+    def valid_attempt_id(cls, attempt_id):
+        """Attempt ids come from students and end up in a file name: plain tokens only"""
+        return isinstance(attempt_id, str) and cls._ATTEMPT_ID.fullmatch(attempt_id) is not None
+
+    def path_for(self, exam_name, student_name, attempt_id):
+        if not self.valid_attempt_id(attempt_id):
+            raise ValueError(f"invalid attempt id {attempt_id!r}")
+        return os.path.join(self.events_dir, f"{exam_name}_{student_name}_{attempt_id}.jsonl")
+
+    def append(self, exam_name, student_name, attempt_id, seq, events):
+        """Write one batch; returns False if this seq was already written"""
+        path = self.path_for(exam_name, student_name, attempt_id)
+        with self._lock:
+            if path not in self._last_seq:
+                self._last_seq[path] = self._scan_last_seq(path)
+                while len(self._last_seq) > self.MAX_TRACKED_SEQ:
+                    self._last_seq.popitem(last=False)
+            self._last_seq.move_to_end(path)
+            if seq <= self._last_seq[path]:
+                return False
+            handle = self._handle(path)
+            handle[0].write("".join(json.dumps(dict(e, seq=seq), separators=(",", ":")) + "\n" for e in events))
+            handle[0].flush()
+            handle[1] += len(events)
+            self._last_seq[path] = seq
+            if handle[1] >= self.FSYNC_EVERY:
+                os.fsync(handle[0].fileno())
+                handle[1] = 0
+            return True
+
+    def read(self, exam_name, student_name, attempt_id):
+        """Yield an attempt's events in arrival order (without the batch seq)"""
+        path = self.path_for(exam_name, student_name, attempt_id)
+        with self._lock:
+            if path in self._open:
+                self._open[path][0].flush()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line after a crash
+                    event.pop("seq", None)
+                    yield event
+        except FileNotFoundError:
+            return
+
+    def close_attempt(self, exam_name, student_name, attempt_id):
+        """fsync and close an attempt's stream once it has been submitted"""
+        path = self.path_for(exam_name, student_name, attempt_id)
+        with self._lock:
+            handle = self._open.pop(path, None)
+            self._last_seq.pop(path, None)
+            if handle is not None:
+                self._close(handle)
+            elif path in self._evicted_unsynced:
+                self._fsync_path(path)
+            self._evicted_unsynced.discard(path)
+
+    def remove_attempt(self, exam_name, student_name, attempt_id):
+        """Delete an attempt's stream (the attempt itself was deleted)"""
+        path = self.path_for(exam_name, student_name, attempt_id)
+        with self._lock:
+            handle = self._open.pop(path, None)
+            if handle is not None:
+                handle[0].close()
+            self._last_seq.pop(path, None)
+            self._evicted_unsynced.discard(path)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def sync_pending(self):
+        """fsync every stream with unsynced lines, including streams whose handle was evicted"""
+        with self._lock:
+            for handle in self._open.values():
+                if handle[1]:
+                    os.fsync(handle[0].fileno())
+                    handle[1] = 0
+            for path in self._evicted_unsynced:
+                self._fsync_path(path)
+            self._evicted_unsynced.clear()
+
+    def close(self):
+        with self._lock:
+            while self._open:
+                self._close(self._open.popitem()[1])
+            for path in self._evicted_unsynced:
+                self._fsync_path(path)
+            self._evicted_unsynced.clear()
+            self._last_seq.clear()
+
+    def _handle(self, path):
+        handle = self._open.get(path)
+        if handle is None:
+            os.makedirs(self.events_dir, exist_ok=True)
+            handle = self._open[path] = [open(path, "a", encoding="utf-8"), 0]
+            if path in self._evicted_unsynced:
+                # Lines left unsynced by the evicted handle are fsynced through this one
+                self._evicted_unsynced.discard(path)
+                handle[1] = 1
+            while len(self._open) > self.MAX_OPEN:
+                old_path, old = self._open.popitem(last=False)
+                # Already flushed to the OS; the fsync is left to the next sync_pending()
+                old[0].close()
+                if old[1]:
+                    self._evicted_unsynced.add(old_path)
+        self._open.move_to_end(path)
+        return handle
+
+    @staticmethod
+    def _close(handle):
+        handle[0].flush()
+        if handle[1]:
+            os.fsync(handle[0].fileno())
+        handle[0].close()
+
+    @staticmethod
+    def _fsync_path(path):
+        try:
+            with open(path, "ab") as f:  # writable: Windows refuses to fsync a read-only handle
+                os.fsync(f.fileno())
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _scan_last_seq(path):
+        last = 0
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        last = max(last, json.loads(line).get("seq", 0))
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            pass
+        return last
+
+
+class ResultsStore:
+    """SQLite index of submitted attempts and their detections.
+
+    The JSON files in the logs folder stay the durable record; this index is
+    what the logs viewer and the dashboard query. Each submission is indexed
+    in one transaction, and sync_from_logs() re-imports any log file whose
+    mtime changed (or that appeared or vanished) behind the app's back.
+    """
+    SCHEMA_VERSION = 1
+
+    def __init__(self, db_path, logs_dir):
+        self.db_path = db_path
+        self.logs_dir = logs_dir
+        self._lock = threading.Lock()
+        self._db = None
+        self._synced = False
+
+    def _conn(self):
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            db = sqlite3.connect(self.db_path, check_same_thread=False)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("PRAGMA foreign_keys=ON")
+            if db.execute("PRAGMA user_version").fetchone()[0] < self.SCHEMA_VERSION:
+                with db:
+                    db.executescript(f"""
+                        CREATE TABLE IF NOT EXISTS attempts (
+                            id INTEGER PRIMARY KEY,
+                            classname TEXT NOT NULL,
+                            exam_name TEXT NOT NULL,
+                            student_name TEXT NOT NULL,
+                            attempt_id TEXT,
+                            score INTEGER,
+                            total INTEGER,
+                            duration_sec REAL,
+                            finished_at TEXT,
+                            detection_count INTEGER NOT NULL DEFAULT 0,
+                            answers TEXT,
+                            log_path TEXT,
+                            log_mtime_ns INTEGER,
+                            UNIQUE (classname, exam_name, student_name)
+                        );
+                        CREATE INDEX IF NOT EXISTS attempts_by_log ON attempts (log_path);
+                        CREATE TABLE IF NOT EXISTS detections (
+                            attempt INTEGER NOT NULL REFERENCES attempts(id) ON DELETE CASCADE,
+                            seq INTEGER NOT NULL,
+                            t_first INTEGER,
+                            t_last INTEGER,
+                            event TEXT,
+                            count INTEGER NOT NULL DEFAULT 1,
+                            PRIMARY KEY (attempt, seq)
+                        ) WITHOUT ROWID;
+                        PRAGMA user_version = {self.SCHEMA_VERSION};
+                    """)
+            self._db = db
+        return self._db
+
+    def record_attempt(self, log_data, log_path=None):
+        """Index one submission (replacing any previous attempt for the same class/exam/student)"""
+        self.record_attempts([(log_data, log_path)])
+
+    def record_attempts(self, items):
+        """Index a batch of (log_data, log_path) submissions in a single transaction"""
+        with self._lock:
+            db = self._conn()
+            with db:
+                for log_data, log_path in items:
+                    self._insert(db, log_data, log_path)
+
+    def _insert(self, db, log_data, log_path):
+        mtime_ns = None
+        if log_path is not None:
+            try:
+                mtime_ns = os.stat(log_path).st_mtime_ns
+            except OSError:
+                pass
+        detections = log_data.get("detections", [])
+        key = (log_data.get("classname") or "", log_data["exam_name"], log_data["student_name"])
+        db.execute("DELETE FROM attempts WHERE classname = ? AND exam_name = ? AND student_name = ?", key)
+        cur = db.execute(
+            "INSERT INTO attempts (classname, exam_name, student_name, attempt_id, score, total, duration_sec,"
+            " finished_at, detection_count, answers, log_path, log_mtime_ns) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            key + (log_data.get("attempt_id"), log_data.get("score"), log_data.get("total"),
+                   log_data.get("duration_taken_sec"), log_data.get("finished_at"),
+                   sum(d.get("count", 1) for d in detections),
+                   json.dumps(log_data["answers"]) if "answers" in log_data else None,
+                   log_path, mtime_ns))
+        db.executemany(
+            "INSERT INTO detections (attempt, seq, t_first, t_last, event, count) VALUES (?, ?, ?, ?, ?, ?)",
+            ((cur.lastrowid, i, d.get("timestamp_relative_sec"),
+              d.get("last_relative_sec", d.get("timestamp_relative_sec")), d.get("event"), d.get("count", 1))
+             for i, d in enumerate(detections)))
+
+    def delete_attempt(self, classname, exam_name, student_name):
+        with self._lock:
+            db = self._conn()
+            with db:
+                db.execute("DELETE FROM attempts WHERE classname = ? AND exam_name = ? AND student_name = ?",
+                           (classname, exam_name, student_name))
+
+    def attempts_for(self, classname, exam_name):
+        """student name -> summary dict for every submitted attempt of one exam in one class"""
+        with self._lock:
+            rows = self._conn().execute(
+                "SELECT student_name, score, total, duration_sec, finished_at, detection_count FROM attempts"
+                " WHERE classname = ? AND exam_name = ?", (classname, exam_name)).fetchall()
+        return {r["student_name"]: dict(r) for r in rows}
+
+    def attempt_summary(self, classname, exam_name, student_name):
+        with self._lock:
+            row = self._conn().execute(
+                "SELECT student_name, attempt_id, score, total, duration_sec, finished_at, detection_count FROM attempts"
+                " WHERE classname = ? AND exam_name = ? AND student_name = ?",
+                (classname, exam_name, student_name)).fetchone()
+        return dict(row) if row else None
+
+    def attempt_detail(self, classname, exam_name, student_name):
+        """A submitted attempt in log format (summary fields plus its detections), or None"""
+        with self._lock:
+            db = self._conn()
+            row = db.execute(
+                "SELECT * FROM attempts WHERE classname = ? AND exam_name = ? AND student_name = ?",
+                (classname, exam_name, student_name)).fetchone()
+            if row is None:
+                return None
+            detections = db.execute(
+                "SELECT t_first, t_last, event, count FROM detections WHERE attempt = ? ORDER BY seq",
+                (row["id"],)).fetchall()
+        return {
+            "classname": row["classname"], "exam_name": row["exam_name"], "student_name": row["student_name"],
+            "score": row["score"], "total": row["total"], "duration_taken_sec": row["duration_sec"] or 0,
+            "finished_at": row["finished_at"], "answers": json.loads(row["answers"]) if row["answers"] else [],
+            "detections": [{"timestamp_relative_sec": d["t_first"], "last_relative_sec": d["t_last"],
+                            "event": d["event"], "count": d["count"]} for d in detections],
+        }
+
+    def ensure_synced(self):
+        """Run sync_from_logs() once per process, for readers that may start before the server does"""
+        if not self._synced:
+            self.sync_from_logs()
+
+    def sync_from_logs(self):
+        """Bring the index in line with the logs folder; only new or modified files are parsed"""
+        try:
+            on_disk = {e.path: e.stat().st_mtime_ns for e in os.scandir(self.logs_dir)
+                       if e.is_file() and e.name.endswith(".json")}
+        except FileNotFoundError:
+            on_disk = {}
+        with self._lock:
+            db = self._conn()
+            indexed = dict(db.execute("SELECT log_path, log_mtime_ns FROM attempts WHERE log_path IS NOT NULL"))
+            with db:
+                for path in indexed.keys() - on_disk.keys():
+                    db.execute("DELETE FROM attempts WHERE log_path = ?", (path,))
+                for path, mtime_ns in on_disk.items():
+                    if indexed.get(path) == mtime_ns:
+                        continue
+                    try:
+                        with open(path, "r", encoding="utf-8") as f:
+                            log_data = json.load(f)
+                        self._insert(db, log_data, path)
+                    except (OSError, ValueError, KeyError) as e:
+                        print(f"Results index: skipped {os.path.basename(path)}: {e}")
+            self._synced = True
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+class SubmissionJournal:
+    """Write-behind queue for submissions: durable now, materialized later.
+
+    submit() appends the record to an append-only journal and returns once it
+    is fsynced; concurrent submitters share one fsync (group commit). A writer
+    thread hands queued records to materialize(batch) in batches of up to
+    BATCH_SIZE and truncates the journal whenever it has caught up. Records
+    still in the journal when start() runs (after a crash) are replayed.
+    """
+    BATCH_SIZE = 64
+    RETRY_DELAY = 1.0  # seconds before retrying a batch whose materialize() failed
+
+    def __init__(self, journal_path, materialize):
+        self.journal_path = journal_path
+        self.materialize = materialize  # called with [(key, record), ...]
+        self._lock = threading.Lock()  # journal file and _pending
+        self._sync_lock = threading.Lock()
+        self._materializing = threading.Lock()  # held by the writer while a batch is being written out
+        self._pending = OrderedDict()  # key -> record, journaled but not yet materialized
+        self._file = None
+        self._written = 0
+        self._synced = 0
+        self._wake = threading.Event()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        """Replay whatever an earlier run left in the journal, then start the writer thread"""
+        if self._thread is not None:
+            return
+        with self._lock:
+            self._pending.update(self._replay())
+            self._file = open(self.journal_path, "ab")
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="submission-writer", daemon=True)
+        self._thread.start()
+        self._wake.set()
+
+    def _replay(self):
+        records = OrderedDict()
+        try:
+            with open(self.journal_path, "rb") as f:
+                for line in f:
+                    try:
+                        key, record = json.loads(line)
+                    except ValueError:
+                        break  # torn tail from a crash mid-append; nothing after it was acknowledged
+                    records.pop(key, None)
+                    if record is not None:  # None marks a discarded record
+                        records[key] = record
+        except FileNotFoundError:
+            pass
+        return records
+
+    def submit(self, key, record):
+        """Journal one record under key (a later submit for the same key supersedes it)"""
+        line = json.dumps([key, record], ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+        with self._lock:
+            if self._file is None:
+                raise RuntimeError("submission journal is not running")
+            self._file.write(line)
+            self._pending.pop(key, None)
+            self._pending[key] = record
+            self._written += 1
+            ticket = self._written
+        with self._sync_lock:
+            if self._synced < ticket:
+                with self._lock:
+                    self._file.flush()
+                    target, fd = self._written, self._file.fileno()
+                os.fsync(fd)
+                self._synced = target
+        self._wake.set()
+
+    def pending(self, key):
+        """The record queued under key if it has not been materialized yet, else None"""
+        with self._lock:
+            return self._pending.get(key)
+
+    def discard(self, key):
+        """Drop the record queued under key (e.g. the attempt was deleted); returns it, or None.
+
+        Waits for a batch being written out, so nothing for key is materialized after this returns.
+        """
+        with self._materializing, self._lock:
+            record = self._pending.pop(key, None)
+            if record is not None and self._file is not None:
+                self._file.write(json.dumps([key, None], separators=(",", ":")).encode("utf-8") + b"\n")
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            return record
+
+    def pending_items(self):
+        """Snapshot of every (key, record) not materialized yet"""
+        with self._lock:
+            return list(self._pending.items())
+
+    def stop(self):
+        """Materialize everything still queued, then stop the writer and close the journal"""
+        if self._thread is None:
+            return
+        self._running = False
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
+        with self._lock:
+            self._file.close()
+            self._file = None
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            if not self._drain() and self._running:
+                time.sleep(self.RETRY_DELAY)
+                self._wake.set()
+            elif not self._running:
+                return
+
+    def _drain(self):
+        """Materialize batches until the queue is empty; False if a batch failed"""
+        while True:
+            with self._lock:
+                batch = list(self._pending.items())[:self.BATCH_SIZE]
+            if not batch:
+                return True
+            with self._materializing:
+                with self._lock:
+                    # discard() may have dropped some of the batch while we waited
+                    batch = [(key, record) for key, record in batch if self._pending.get(key) is record]
+                if not batch:
+                    continue
+                try:
+                    self.materialize(batch)
+                except Exception as e:
+                    print(f"Submission writer error: {e}")
+                    return False
+                with self._lock:
+                    for key, record in batch:
+                        if self._pending.get(key) is record:
+                            del self._pending[key]
+                    if not self._pending:
+                        self._file.seek(0)
+                        self._file.truncate()
+                        self._file.flush()
+                        os.fsync(self._file.fileno())
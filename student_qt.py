@@ -1,12 +1,13 @@
-import sys, os, json, random
+import sys, os, json, random, uuid
 from datetime import datetime
 from PyQt6.QtWidgets import *
-from PyQt6.QtCore import Qt, QTimer, QEvent
-from PyQt6.QtGui import QFont, QBrush, QColor
+from PyQt6.QtCore import Qt, QTimer, QEvent, QObject, pyqtSignal
+from PyQt6.QtGui import QFont, QBrush, QColor, QTextCursor
 
 # Import the shared networking module
 import network_logic
-from teacher_qt import AnimatedBubbleButton
+import storage
+from common_qt import AnimatedBubbleButton, get_data_path
 
 # Button style helper to match teacher UI
 BUTTON_RADIUS = 8
@@ -15,12 +16,164 @@ BUTTON_FONT_SIZE = 14
 def make_btn_style(bg_color, text_color="white"):
     return f"background-color: {bg_color}; color: {text_color}; border-radius: {BUTTON_RADIUS}px; padding: {BUTTON_PADDING}; font-size: {BUTTON_FONT_SIZE}px; font-weight: bold; border: none; font-family: Poppins;"
 
+class DetectionAggregator:
+    """Coalesces repeats of the same detection within `window` seconds into one record"""
+    def __init__(self, window=2):
+        self.window = window
+        self.current = None
+
+    def add(self, msg, rel):
+        """Returns (record, is_new)"""
+        cur = self.current
+        if cur is not None and cur["event"] == msg and rel - cur["last_relative_sec"] <= self.window:
+            cur["count"] += 1
+            cur["last_relative_sec"] = rel
+            return cur, False
+        self.current = {"timestamp_relative_sec": rel, "last_relative_sec": rel, "event": msg, "count": 1}
+        return self.current, True
+
+    def close(self):
+        """Stop coalescing into the open record (it is about to be sent)"""
+        self.current = None
+
+    @staticmethod
+    def describe(record):
+        first, last = record["timestamp_relative_sec"], record.get("last_relative_sec", record["timestamp_relative_sec"])
+        span = f"{first}s" if first == last else f"{first}-{last}s"
+        count = record.get("count", 1)
+        return f"[{span}] {record['event']}" + (f" ×{count}" if count > 1 else "")
+
+class SubmissionSpool(QObject):
+    """Durable outbox on the student machine: packets stay on disk until their own teacher records or rejects them"""
+    delivered = pyqtSignal(dict, dict)  # packet, teacher response
+    rejected = pyqtSignal(dict, dict)
+
+    def __init__(self, spool_dir):
+        super().__init__()
+        self.spool_dir = spool_dir
+        self.teacher_ips = {}  # teacher id -> latest known address
+        self.backoff = network_logic.Backoff(base=1.0, cap=60.0)
+        self._timer = None
+        self._flushing = False
+
+    def _path(self, key):
+        return os.path.join(self.spool_dir, f"{key}.json")
+
+    @staticmethod
+    def settled(resp):
+        """True once a packet needs no further sends: recorded, or rejected for good"""
+        return resp.get("status") == "success" or bool(resp.get("rejected"))
+
+    def pending(self):
+        """Spooled entries (teacher_id, teacher_ip, packet), oldest first"""
+        try:
+            entries = [e for e in os.scandir(self.spool_dir) if e.is_file() and e.name.endswith(".json")]
+        except FileNotFoundError:
+            return []
+        spooled = []
+        for e in sorted(entries, key=lambda e: e.stat().st_mtime_ns):
+            try:
+                with open(e.path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if isinstance(entry, dict) and isinstance(entry.get("packet"), dict):
+                spooled.append((e.name[:-5], entry))
+        return spooled
+
+    def save(self, key, packet, teacher_id, teacher_ip):
+        """Spool a packet for one teacher without sending it; returns the spool entry"""
+        os.makedirs(self.spool_dir, exist_ok=True)
+        entry = {"teacher_id": teacher_id, "teacher_ip": teacher_ip, "packet": packet}
+        storage.write_json(self._path(key), entry)
+        if teacher_ip:
+            self.teacher_ips[teacher_id] = teacher_ip
+        return entry
+
+    def discard(self, key):
+        """Drop a spooled packet that was delivered some other way"""
+        storage.remove_file(self._path(key))
+
+    def submit(self, key, packet, teacher_id, teacher_ip, callback=None):
+        """Spool a packet for one teacher and try to deliver it right away; callback gets the teacher's response (or the error)"""
+        entry = self.save(key, packet, teacher_id, teacher_ip)
+
+        def on_response(resp):
+            if not self.settled(resp):
+                self._schedule_retry()
+            if callback is not None:
+                callback(resp)
+        self._send(key, entry, on_response)
+
+    def teacher_seen(self, teacher_id, ip):
+        """Discovery hook: a teacher (re)appeared, so send its packets now instead of waiting out the backoff"""
+        self.teacher_ips[teacher_id] = ip
+        self.backoff.reset()
+        self.flush()
+
+    def flush(self):
+        """Send spooled packets one after another; a teacher that fails is skipped for the rest of the pass"""
+        if self._flushing:
+            return
+        self._flushing = True
+        self._flush_next(self.pending(), set())
+
+    def _flush_next(self, queue, failed):
+        queue = [item for item in queue if item[1].get("teacher_id") not in failed]
+        if not queue:
+            self._flushing = False
+            if failed:
+                self._schedule_retry()
+            else:
+                self.backoff.reset()
+            return
+
+        def on_response(resp):
+            if not self.settled(resp):
+                failed.add(entry.get("teacher_id"))
+            self._flush_next(queue, failed)
+        key, entry = queue.pop(0)
+        self._send(key, entry, on_response)
+
+    def _send(self, key, entry, callback):
+        packet = entry["packet"]
+        ip = self.teacher_ips.get(entry.get("teacher_id")) or entry.get("teacher_ip")
+        if not ip:
+            callback({"status": "error", "message": "No teacher found", "retryable": True})
+            return
+
+        def on_response(resp):
+            if resp.get("status") == "success":
+                storage.remove_file(self._path(key))
+                self.delivered.emit(packet, resp)
+            elif resp.get("rejected"):
+                storage.remove_file(self._path(key))
+                print(f"Teacher rejected spooled {packet.get('type')} for {packet.get('exam_name')}: {resp.get('message')}")
+                self.rejected.emit(packet, resp)
+            callback(resp)
+        network_logic.client.request(ip, packet, on_response)
+
+    def _schedule_retry(self):
+        if self._timer is None:
+            self._timer = QTimer(self)
+            self._timer.setSingleShot(True)
+            self._timer.timeout.connect(self.flush)
+        if not self._timer.isActive():
+            self._timer.start(int(self.backoff.next_delay() * 1000))
+
+submission_spool = SubmissionSpool(get_data_path("outbox"))
+
 class StudentWindow(QWidget):
-    def __init__(self, name, teacher_ip, portal, classname):
+    EVENT_FLUSH_MS = 3000
+    DETECTION_COALESCE_SEC = 2     # repeats closer together than this become one record
+    DETECTION_DISPLAY_LINES = 100  # on-screen ring buffer
+
+    def __init__(self, name, teacher_ip, portal, classname, teacher_id=None):
         super().__init__(portal)
         # 1. ASSIGN VARIABLES FIRST
         self.portal = portal
-        self.teacher_ip = teacher_ip
+        self.teacher_ip = teacher_ip  # kept current by the portal if the teacher's address changes
+        self.teacher_id = teacher_id
         self.student_name = name
         self.student_class = classname
 
@@ -28,10 +181,25 @@ class StudentWindow(QWidget):
         self.exam_active = False
         self.current_exam_data = {}
         self.answer_widgets = []
-        self.detections = []
         self.start_time = None
         self.timer_id = QTimer()
 
+        # Detections are streamed to the teacher in numbered batches while the exam runs
+        self.attempt_id = None
+        self.pending_events = []   # logged since the last flush
+        self.event_outbox = []     # [(seq, events)] frozen batches not yet acknowledged
+        self.event_seq = 0
+        self.detection_aggregator = DetectionAggregator(self.DETECTION_COALESCE_SEC)
+        self.event_flush_timer = QTimer()
+        self.event_flush_timer.setInterval(self.EVENT_FLUSH_MS)
+        self.event_flush_timer.timeout.connect(self.flush_detection_events)
+        self.event_backoff = network_logic.Backoff(base=self.EVENT_FLUSH_MS / 1000, cap=60.0)
+        self.event_flush_inflight = False
+
+        # Requests to the teacher run off the GUI thread; kind -> PendingRequest of the latest one
+        self.requests = {}
+        submission_spool.delivered.connect(self.on_spooled_submission_delivered)
+
         # 2. UI Setup (embedded widget)
         self.setFixedSize(900, 600)
         self.setGeometry(0, 0, 900, 600)
@@ -51,31 +219,37 @@ class StudentWindow(QWidget):
         except Exception:
             pass
 
+    def send_request(self, kind, request_dict, callback):
+        """Queue a request to the teacher; a newer request of the same kind cancels the older one"""
+        old = self.requests.pop(kind, None)
+        if old is not None:
+            old.cancel()
+        self.requests[kind] = network_logic.client.request(self.teacher_ip, request_dict, callback)
+        return self.requests[kind]
+
+    def cancel_requests(self):
+        for handle in self.requests.values():
+            handle.cancel()
+        self.requests.clear()
+
     def refresh_exam_list(self):
-        """Fetch exam list and CHECK each one's status from the teacher"""
+        """Fetch every assigned exam and its status from the teacher in one request"""
+        self.exam_table.setRowCount(0)
+        self.send_request("dashboard", {
+            "type": "GET_DASHBOARD", "classname": self.student_class, "student_name": self.student_name
+        }, self.populate_exam_list)
+
+    def populate_exam_list(self, resp):
         self.exam_table.setRowCount(0)
-        
-        # 1. Get the list of exams
-        resp = network_logic.network_request(self.teacher_ip, {
-            "type": "GET_EXAM_LIST", "classname": self.student_class
-        })
-        
         if resp.get("status") == "success":
-            for ex_name in resp.get("exams", []):
+            for exam in resp.get("exams", []):
                 row = self.exam_table.rowCount()
                 self.exam_table.insertRow(row)
                 
-                # 2. Ask the teacher if THIS student has taken THIS exam
-                status_resp = network_logic.network_request(self.teacher_ip, {
-                    "type": "CHECK_TAKEN", 
-                    "exam_name": ex_name, 
-                    "student_name": self.student_name
-                })
-                
-                is_taken = status_resp.get("taken", False)
+                is_taken = exam.get("taken", False)
                 status_text = "COMPLETED" if is_taken else "AVAILABLE"
                 
-                name_item = QTableWidgetItem(ex_name)
+                name_item = QTableWidgetItem(exam["exam_name"])
                 status_item = QTableWidgetItem(status_text)
                 
                 # Style the status with background color for visibility
@@ -85,9 +259,18 @@ class StudentWindow(QWidget):
                 else:
                     status_item.setBackground(QBrush(QColor("#e8f5e9")))  # Light green background
                     status_item.setForeground(QBrush(QColor("#2e7d32")))  # Dark green text
+
+                # Details: score once submitted (if the teacher shows it), otherwise the time limit
+                if is_taken and exam.get("score") is not None:
+                    details = f"Score: {exam['score']} / {exam.get('question_count') or '?'}"
+                elif exam.get("duration_enabled"):
+                    details = f"Time Limit: {exam.get('duration')} minutes"
+                else:
+                    details = "No time limit"
                     
                 self.exam_table.setItem(row, 0, name_item)
                 self.exam_table.setItem(row, 1, status_item)
+                self.exam_table.setItem(row, 2, QTableWidgetItem(details))
 
     def init_detection_log_ui(self):
         """Creates the bottom detection log used during exams"""
@@ -99,11 +282,12 @@ class StudentWindow(QWidget):
         header.setStyleSheet("color: #333;") 
         layout.addWidget(header)
         
-        self.detection_display = QTextEdit()
+        self.detection_display = QPlainTextEdit()
         self.detection_display.setReadOnly(True)
+        self.detection_display.setMaximumBlockCount(self.DETECTION_DISPLAY_LINES)
         self.detection_display.setFont(QFont("Poppins", 9))
         self.detection_display.setStyleSheet("""
-            QTextEdit {
+            QPlainTextEdit {
                 background-color: #ffffff; 
                 color: #d32f2f;
                 border: none;
@@ -158,8 +342,8 @@ class StudentWindow(QWidget):
         exams_label.setStyleSheet("font-size: 14px; font-weight: bold; color: #0B2C5D; background-color: #F8DD70;")
         lay.addWidget(exams_label)
 
-        self.exam_table = QTableWidget(0, 2)
-        self.exam_table.setHorizontalHeaderLabels(["Exam Name", "Status"])
+        self.exam_table = QTableWidget(0, 3)
+        self.exam_table.setHorizontalHeaderLabels(["Exam Name", "Status", "Details"])
         self.exam_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
         self.exam_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
         self.exam_table.setStyleSheet("""
@@ -200,8 +384,10 @@ class StudentWindow(QWidget):
         # Stop any active exam timers
         try:
             self.timer_id.stop()
+            self.event_flush_timer.stop()
         except Exception:
             pass
+        self.cancel_requests()
         
         self.hide()
         try:
@@ -229,11 +415,12 @@ class StudentWindow(QWidget):
             return
 
         # Proceed to download if available
-        resp = network_logic.network_request(self.teacher_ip, {
+        self.send_request("exam", {
             "type": "GET_EXAM", 
             "exam_name": ex_name
-        })
-        
+        }, lambda resp: self.on_exam_downloaded(ex_name, resp))
+
+    def on_exam_downloaded(self, ex_name, resp):
         if resp.get("status") == "success":
             self.current_exam_data = resp["data"]
             if self.current_exam_data.get("settings", {}).get("shuffle"):
@@ -342,7 +529,13 @@ class StudentWindow(QWidget):
         self.setup_exam_ui()
         self.exam_active = True
         self.start_time = datetime.now()
-        self.detections = []
+        self.attempt_id = uuid.uuid4().hex
+        self.pending_events = []
+        self.event_outbox = []
+        self.event_seq = 0
+        self.event_flush_inflight = False
+        self.detection_aggregator = DetectionAggregator(self.DETECTION_COALESCE_SEC)
+        self.event_flush_timer.start()
         self.detection_display.clear()
 
         settings = self.current_exam_data.get("settings", {})
@@ -452,10 +645,10 @@ class StudentWindow(QWidget):
         outer_lay.addWidget(self.log_dock) 
 
         # Submit button
-        submit = QPushButton("SUBMIT EXAM")
-        submit.setStyleSheet(make_btn_style("#28a745", "white") + "font-size: 16px; padding: 10px;")
-        submit.clicked.connect(self.finalize_exam)
-        outer_lay.addWidget(submit)
+        self.submit_btn = QPushButton("SUBMIT EXAM")
+        self.submit_btn.setStyleSheet(make_btn_style("#28a745", "white") + "font-size: 16px; padding: 10px;")
+        self.submit_btn.clicked.connect(self.finalize_exam)
+        outer_lay.addWidget(self.submit_btn)
 
         self.stack.addWidget(page)
         self.stack.setCurrentWidget(page)
@@ -471,26 +664,25 @@ class StudentWindow(QWidget):
             self.finalize_exam()
 
     def finalize_exam(self):
+        if not self.exam_active:
+            return  # already submitting
         self.exam_active = False
         self.timer_id.stop()
+        self.event_flush_timer.stop()
+        self.freeze_pending_events()
         
-        score = 0
-
-        for i, q in enumerate(self.current_exam_data["questions"]):
+        # Collect raw answers ordered by question id; the teacher grades them
+        questions = self.current_exam_data["questions"]
+        answers = [None] * len(questions)
+        for i, q in enumerate(questions):
             ans_widget = self.answer_widgets[i]
-            is_correct = False
-            val = ""
-
             if q["type"] in ("mcq", "tf"):
                 val = ans_widget.checkedId()
-                correct_val = q.get("answer_index") if q["type"] == "mcq" else (1 if q.get("correct_tf") else 0)
-                if val == correct_val: is_correct = True
-            
             elif q["type"] == "text":
                 val = ans_widget.text().strip()
-                if val.lower() == q.get("answer_text", "").strip().lower(): is_correct = True
-            
-            if is_correct: score += 1
+            else:
+                val = None
+            answers[q.get("id", i)] = val
 
         finish_time = datetime.now()
         duration = (finish_time - self.start_time).total_seconds() if self.start_time else 0
@@ -501,20 +693,36 @@ class StudentWindow(QWidget):
             "exam_name": self.current_exam_data.get("exam_name"),
             "student_name": self.student_name,
             "classname": self.student_class,
-            "score": score,
-            "detections": self.detections,
+            "answers": answers,
+            "attempt_id": self.attempt_id,
+            "event_batches": list(self.event_outbox),  # a snapshot: acks still pop the live list
             "duration_taken_sec": duration,
             "finished_at": finish_time.strftime("%Y-%m-%d %H:%M:%S")
         }
 
-        # Send the results back to the Teacher's computer
-        resp = network_logic.network_request(self.teacher_ip, log_packet)
+        # Send the results back to the Teacher's computer (spooled on disk until the teacher has them)
+        self.submit_btn.setEnabled(False)
+        self.submit_btn.setText("SUBMITTING...")
+        submission_spool.submit(self.attempt_id, log_packet, self.teacher_id, self.teacher_ip,
+                                lambda resp: self.on_exam_submitted(resp, len(questions)))
+        # The final packet carries every unacknowledged batch, so their own spool files can go
+        for seq, _ in self.event_outbox:
+            submission_spool.discard(self.event_batch_key(seq))
 
-        msg = "Exam Submitted Successfully!"
-        if self.current_exam_data.get("settings", {}).get("show_score", True):
-            msg += f"\nScore: {score} / {len(self.current_exam_data['questions'])}"
-        
-        QMessageBox.information(self, "Finished", msg)
+    def on_exam_submitted(self, resp, question_count):
+        if resp.get("status") == "success":
+            msg = "Exam Submitted Successfully!"
+            if "score" in resp:
+                msg += f"\nScore: {resp['score']} / {resp.get('total', question_count)}"
+            QMessageBox.information(self, "Finished", msg)
+        elif resp.get("retryable"):
+            QMessageBox.warning(self, "Saved Offline", "The teacher could not be reached. Your answers are saved on this "
+                                "computer and will be sent automatically as soon as the connection returns.")
+        elif not resp.get("rejected"):
+            QMessageBox.warning(self, "Saved Offline", f"The teacher could not record this submission yet:\n{resp.get('message')}\n\n"
+                                "Your answers are saved on this computer and will be sent again automatically.")
+        else:
+            QMessageBox.critical(self, "Submission Rejected", f"The teacher rejected this submission:\n{resp.get('message')}")
         self.init_dashboard_view() 
 
     # ===================== CHEAT DETECTION =====================
@@ -555,12 +763,77 @@ class StudentWindow(QWidget):
     def log_cheat_event(self, msg):
         now = datetime.now()
         rel = int((now - self.start_time).total_seconds()) if self.start_time else 0
-        event_data = {
-            "timestamp_relative_sec": rel,
-            "event": msg
+        record, is_new = self.detection_aggregator.add(msg, rel)
+        line = DetectionAggregator.describe(record)
+        if is_new:
+            self.pending_events.append(record)
+            self.detection_display.appendPlainText(line)
+        else:
+            # Rewrite the last line in place instead of appending a duplicate
+            cursor = self.detection_display.textCursor()
+            cursor.movePosition(QTextCursor.MoveOperation.End)
+            cursor.movePosition(QTextCursor.MoveOperation.StartOfBlock, QTextCursor.MoveMode.KeepAnchor)
+            cursor.insertText(line)
+
+    def freeze_pending_events(self):
+        """Seal the events logged so far into the next numbered batch, spooled on disk until it is acknowledged"""
+        self.detection_aggregator.close()
+        if self.pending_events:
+            self.event_seq += 1
+            self.event_outbox.append((self.event_seq, self.pending_events))
+            submission_spool.save(self.event_batch_key(self.event_seq), self.event_batch_packet(self.event_seq, self.pending_events),
+                                  self.teacher_id, self.teacher_ip)
+            self.pending_events = []
+
+    def event_batch_key(self, seq, attempt_id=None):
+        return f"{attempt_id or self.attempt_id}.{seq}"
+
+    def event_batch_packet(self, seq, events, attempt_id=None):
+        return {
+            "type": "LOG_EVENTS",
+            "exam_name": self.current_exam_data.get("exam_name"),
+            "student_name": self.student_name,
+            "classname": self.student_class,
+            "attempt_id": attempt_id or self.attempt_id,
+            "seq": seq,
+            "events": events
         }
-        self.detections.append(event_data)
-        self.detection_display.append(f"[{rel}s] {msg}")
+
+    def flush_detection_events(self):
+        """Send unacknowledged batches in order; a failed batch is retried with the same seq"""
+        self.freeze_pending_events()
+        if self.event_outbox and not self.event_flush_inflight:
+            self.send_event_batch()
+
+    def send_event_batch(self):
+        """Send the oldest unacknowledged batch; its ack sends the next one (one batch in flight at a time)"""
+        seq, events = self.event_outbox[0]
+        attempt_id = self.attempt_id
+
+        def on_ack(resp):
+            if attempt_id != self.attempt_id:
+                return
+            self.event_flush_inflight = False
+            if resp.get("status") != "success":
+                # Back off (with jitter) while the teacher is unreachable instead of retrying every tick
+                self.event_flush_timer.setInterval(max(self.EVENT_FLUSH_MS, int(self.event_backoff.next_delay() * 1000)))
+                return
+            if self.event_outbox and self.event_outbox[0][0] == seq:
+                self.event_outbox.pop(0)
+                submission_spool.discard(self.event_batch_key(seq, attempt_id))
+            if self.event_outbox and self.exam_active:
+                self.send_event_batch()
+            else:
+                self.event_backoff.reset()
+                self.event_flush_timer.setInterval(self.EVENT_FLUSH_MS)
+
+        self.event_flush_inflight = True
+        self.send_request("events", self.event_batch_packet(seq, events, attempt_id), on_ack)
+
+    def on_spooled_submission_delivered(self, packet, resp):
+        """A submission saved offline reached the teacher; refresh the dashboard if it is showing"""
+        if not self.exam_active and packet.get("type") == "SUBMIT_LOG" and packet.get("student_name") == self.student_name:
+            self.refresh_exam_list()
 
     # ... [keep finalize_exam, start_exam, setup_exam_ui, update_timer_label as they are] ...
 
@@ -1,27 +1,40 @@
 import json
 import os
 import sys
+from collections import OrderedDict
+import grading
+import metrics
+import storage
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
                              QLineEdit, QPushButton, QStackedWidget, QListWidget, 
                              QGroupBox, QRadioButton, QButtonGroup, QCheckBox, 
                              QSpinBox, QTextEdit, QComboBox, QTreeWidget, 
-                             QTreeWidgetItem, QMessageBox, QFrame, QDialog, QApplication, QGridLayout, QTableWidget, QTableWidgetItem, QMenu, QGraphicsDropShadowEffect, QScrollArea)
-from PyQt6.QtCore import Qt, QPropertyAnimation, QRect, QEasingCurve
+                             QTreeWidgetItem, QMessageBox, QFrame, QDialog, QApplication, QGridLayout, QTableWidget, QTableWidgetItem, QMenu, QGraphicsDropShadowEffect, QScrollArea,
+                             QTableView, QPlainTextEdit, QHeaderView, QAbstractItemView)
+from PyQt6.QtCore import (Qt, QPropertyAnimation, QRect, QEasingCurve, QTimer, QAbstractTableModel, QModelIndex,
+                          QObject, QRunnable, QThreadPool, QFileSystemWatcher, pyqtSignal)
 from PyQt6.QtGui import QPixmap, QColor, QFont
 from PyQt6.QtWidgets import QGraphicsDropShadowEffect
 
-NU_BLUE = "#0B2C5D"
-NU_HOVER = "#154c9e"
+# Shared with the portal and the student UI
+from common_qt import NU_BLUE, NU_HOVER, get_data_path, AnimatedBubbleButton, IconSquareButton
 
-def get_data_path(subfolder):
-    """Get the correct path for data folders (exams, logs, classes) in proctora_data directory"""
-    if getattr(sys, 'frozen', False):
-        # Running as a PyInstaller bundle - use current working directory
-        base_path = os.getcwd()
-    else:
-        # Running from source - use script directory
-        base_path = os.path.dirname(os.path.abspath(__file__))
-    return os.path.join(base_path, 'proctora_data', subfolder)
+# Shared by the request server (LOGIN) and the class pages that edit rosters
+roster_index = storage.RosterIndex(get_data_path("classes"))
+
+def prepare_exam(exam):
+    """Per exam version: the key-less GET_EXAM reply, encoded once, and the compiled answer key"""
+    body = network_logic.encode_message({"status": "success", "data": grading.strip_answer_key(exam)})
+    return body, grading.AnswerKey(exam)
+
+# Shared by the request server (GET_EXAM, GET_DASHBOARD, SUBMIT_LOG) and the exam builder / exam list
+exam_cache = storage.ExamCache(get_data_path("exams"), prepare_exam)
+
+# Per-attempt detection streams written by LOG_EVENTS while students are still in the exam
+detection_log = storage.DetectionLog(get_data_path("events"))
+
+# Indexed copy of every submitted attempt, queried by the logs viewer and GET_DASHBOARD
+results_store = storage.ResultsStore(os.path.join(get_data_path(""), "results.db"), get_data_path("logs"))
 
 # Unified button appearance (colors may vary per-button)
 BUTTON_RADIUS = 8
@@ -30,197 +43,753 @@ BUTTON_FONT_SIZE = 14
 def make_btn_style(bg_color, text_color="white"):
     return f"background-color: {bg_color}; color: {text_color}; border-radius: {BUTTON_RADIUS}px; padding: {BUTTON_PADDING}; font-size: {BUTTON_FONT_SIZE}px; font-weight: bold; border: none; font-family: Poppins;"
 
+import queue
+import selectors
 import socket
+import threading
+import time
+import uuid
 import network_logic
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from PyQt6.QtCore import QThread
+
+class LiveEventBus:
+    """Fan-out of live exam events from request workers to bounded subscriber queues"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = []
+
+    def subscribe(self, maxlen=20000):
+        sub = deque(maxlen=maxlen)
+        with self._lock:
+            self._subscribers = self._subscribers + [sub]
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s is not sub]
+
+    def publish(self, event):
+        for sub in self._subscribers:
+            sub.append(event)
+
+live_events = LiveEventBus()
+
+class DataWatcher(QObject):
+    """Change notifications (submissions and class files) for open teacher views"""
+    attempt_changed = pyqtSignal(str, str, str)  # classname, exam_name, student_name
+    classes_changed = pyqtSignal(list)  # class names, when a class is added or removed
+    class_changed = pyqtSignal(str)  # a class file was rewritten
+
+    def __init__(self, classes_dir):
+        super().__init__()
+        self.classes_dir = classes_dir
+        self._watcher = None
+        self._mtimes = {}
+
+    def start(self):
+        if self._watcher is not None:
+            return
+        os.makedirs(self.classes_dir, exist_ok=True)
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self._rescan)
+        self._watcher.fileChanged.connect(self._rescan)
+        self._watcher.addPath(self.classes_dir)
+        self._mtimes = self._scan()
+        self._watch_files()
+
+    def class_names(self):
+        return sorted(self._mtimes) if self._watcher is not None else sorted(self._scan())
+
+    def _scan(self):
+        try:
+            return {e.name[:-5]: e.stat().st_mtime_ns for e in os.scandir(self.classes_dir)
+                    if e.is_file() and e.name.endswith(".json")}
+        except FileNotFoundError:
+            return {}
+
+    def _watch_files(self):
+        # Replacing a file drops its watch, so re-add whatever is missing after every change
+        watched = set(self._watcher.files())
+        missing = [os.path.join(self.classes_dir, f"{name}.json") for name in self._mtimes]
+        missing = [path for path in missing if path not in watched]
+        if missing:
+            self._watcher.addPaths(missing)
+
+    def _rescan(self, _path=None):
+        previous, self._mtimes = self._mtimes, self._scan()
+        self._watch_files()
+        if previous.keys() != self._mtimes.keys():
+            self.classes_changed.emit(sorted(self._mtimes))
+        for name in previous.keys() & self._mtimes.keys():
+            if previous[name] != self._mtimes[name]:
+                self.class_changed.emit(name)
+
+data_watcher = DataWatcher(get_data_path("classes"))
+
+def materialize_submissions(batch):
+    """Journal writer: turn queued submissions (log path -> log data) into log files and index them"""
+    os.makedirs(get_data_path("logs"), exist_ok=True)
+    for log_path, log_data in batch:
+        storage.write_json(log_path, log_data)
+    results_store.record_attempts([(log_data, log_path) for log_path, log_data in batch])
+    for _, log_data in batch:
+        data_watcher.attempt_changed.emit(log_data.get("classname") or "", log_data["exam_name"], log_data["student_name"])
+
+submission_journal = storage.SubmissionJournal(os.path.join(get_data_path(""), "submissions.journal"), materialize_submissions)
+
+def server_id():
+    """This teacher's id in discovery beacons, kept across restarts so students' spooled submissions still find it"""
+    path = get_data_path("server_id.json")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return str(json.load(f)["id"])
+    except (OSError, ValueError, KeyError, TypeError):
+        new_id = uuid.uuid4().hex[:12]
+        storage.write_json(path, {"id": new_id})
+        return new_id
+
 class RequestHandler(QThread):
-    def __init__(self, parent):
+    """TCP server for student requests: a selector loop feeding a bounded worker pool over keep-alive connections"""
+    MAX_WORKERS = 16          # requests processed at the same time
+    MAX_CONNECTIONS = 400     # open sockets (stays under select()'s 512 limit on Windows)
+    LISTEN_BACKLOG = 128      # pending connections the OS may queue for us
+    CONN_TIMEOUT = 3          # per-socket read/write timeout inside a worker
+    KEEPALIVE_IDLE = 60       # seconds an idle keep-alive session is kept open
+    KEEPALIVE_IDLE_AT_CAP = 5 # tighter idle limit while we are at MAX_CONNECTIONS
+    STATS_DUMP_INTERVAL = 60  # seconds between lines of the optional stats file
+    REQUEST_TYPES = ("LOGIN", "GET_EXAM_LIST", "CHECK_TAKEN", "GET_EXAM", "SUBMIT_LOG", "LOG_EVENTS",
+                     "GET_DASHBOARD", "STATS", "GET_CLASS_LIST")  # reported separately in STATS
+
+    def __init__(self, parent, max_workers=MAX_WORKERS, max_connections=MAX_CONNECTIONS, backlog=LISTEN_BACKLOG,
+                 stats_path=None):
         super().__init__()
         self.parent = parent
         self.running = True
         self.daemon = True
+        self.max_workers = max_workers
+        self.max_connections = max_connections
+        self.backlog = backlog
+
+        # Request metrics, served by STATS; also appended to a JSON-lines file when PROCTORA_STATS_FILE is set
+        self.metrics = metrics.ServerMetrics(self.REQUEST_TYPES)
+        self.stats_path = stats_path or os.environ.get("PROCTORA_STATS_FILE")
+
+        # Workers hand finished connections back to the selector loop through this queue
+        self._handback = queue.SimpleQueue()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
 
     def stop(self):
-        """Stop the request handler thread"""
+        """Stop the request handler thread and wait for in-flight requests to finish"""
         self.running = False
+        self._wake()
+        if self.isRunning():
+            self.wait(5000)
+
+    def _wake(self):
+        try:
+            self._wake_w.send(b"\0")
+        except OSError:
+            pass
 
     def run(self):
+        roster_index.refresh()
+        results_store.sync_from_logs()
+        submission_journal.start()
         server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         server.bind(('0.0.0.0', network_logic.TCP_PORT))
-        server.listen(5)
-        server.settimeout(1)  # Add timeout to allow checking the running flag
-        
-        while self.running:
-            try:
-                conn, addr = server.accept()
-            except socket.timeout:
-                continue
-            
-            try:
-                data = conn.recv(1024 * 50).decode('utf-8')
-                if not data: continue
-                req = json.loads(data)
-                resp = {"status": "error"}
-
-                # 1. LOGIN: Scans all rosters
-                if req["type"] == "LOGIN":
-                    for filename in os.listdir(get_data_path("classes")):
-                        if filename.endswith(".json"):
-                            with open(os.path.join(get_data_path("classes"), filename), "r", encoding="utf-8") as f:
-                                class_data = json.load(f)
-                                if any(s['name'] == req['name'] and s['password'] == req['password'] for s in class_data['students']):
-                                    resp = {"status": "success", "classname": class_data["classname"]}
-                                    break
-                        if resp.get("status") == "success": break
-
-                # 2. GET EXAM LIST
-                elif req["type"] == "GET_EXAM_LIST":
-                    path = os.path.join(get_data_path("classes"), f"{req['classname']}.json")
-                    if os.path.exists(path):
-                        with open(path, "r", encoding="utf-8") as f:
-                            resp = {"status": "success", "exams": json.load(f).get("exams", [])}
-
-                # 3. CHECK TAKEN: Verification logic
-                elif req["type"] == "CHECK_TAKEN":
-                    filename = f"{req['exam_name']}_{req['student_name']}.json"
-                    if os.path.exists(os.path.join(get_data_path("logs"), filename)):
-                        resp = {"status": "success", "taken": True}
+        server.listen(self.backlog)
+        server.setblocking(False)
+
+        sel = selectors.DefaultSelector()
+        sel.register(server, selectors.EVENT_READ, "accept")
+        sel.register(self._wake_r, selectors.EVENT_READ, "wake")
+        pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="proctora-req")
+        open_conns = set()
+        idle_since = {}  # conn -> time it went back to waiting for a request
+        accepting = True
+        last_sync = last_dump = time.monotonic()
+
+        try:
+            while self.running:
+                for key, _ in sel.select(timeout=1):
+                    if key.data == "accept":
+                        try:
+                            conn, addr = server.accept()
+                        except (BlockingIOError, InterruptedError):
+                            continue
+                        conn.setblocking(True)
+                        conn.settimeout(self.CONN_TIMEOUT)
+                        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                        open_conns.add(conn)
+                        idle_since[conn] = time.monotonic()
+                        sel.register(conn, selectors.EVENT_READ, addr)
+                    elif key.data == "wake":
+                        try:
+                            while self._wake_r.recv(512): pass
+                        except (BlockingIOError, InterruptedError):
+                            pass
+                    else:
+                        # Readable client: let a worker take it from here
+                        sel.unregister(key.fileobj)
+                        idle_since.pop(key.fileobj, None)
+                        pool.submit(self._serve_connection, key.fileobj, key.data)
+
+                # Connections coming back from the workers
+                while True:
+                    try:
+                        conn, addr, keep_alive = self._handback.get_nowait()
+                    except queue.Empty:
+                        break
+                    if keep_alive and self.running:
+                        idle_since[conn] = time.monotonic()
+                        sel.register(conn, selectors.EVENT_READ, addr)
                     else:
-                        resp = {"status": "success", "taken": False}
-
-                # 4. GET EXAM: Download content
-                elif req["type"] == "GET_EXAM":
-                    path = os.path.join(get_data_path("exams"), f"{req['exam_name']}.json")
-                    if os.path.exists(path):
-                        with open(path, "r", encoding="utf-8") as f:
-                            resp = {"status": "success", "data": json.load(f)}
-
-                # 5. SUBMIT LOG: Save results
-                elif req["type"] == "SUBMIT_LOG":
-                    os.makedirs(get_data_path("logs"), exist_ok=True)
-                    filename = f"{req['exam_name']}_{req['student_name']}.json"
-                    with open(os.path.join(get_data_path("logs"), filename), "w", encoding="utf-8") as f:
-                        json.dump(req, f, indent=4)
-                    resp = {"status": "success"}
-
-                conn.send(json.dumps(resp).encode('utf-8'))
-            except: pass
-            finally:
+                        open_conns.discard(conn)
+                        conn.close()
+
+                # Drop idle sessions; be stricter about it when we are out of connection slots
+                at_cap = len(open_conns) >= self.max_connections
+                limit = self.KEEPALIVE_IDLE_AT_CAP if at_cap else self.KEEPALIVE_IDLE
+                now = time.monotonic()
+                for conn in [c for c, t in idle_since.items() if now - t > limit]:
+                    sel.unregister(conn)
+                    del idle_since[conn]
+                    open_conns.discard(conn)
+                    conn.close()
+
+                self.metrics.set_connections(len(open_conns))
+
+                # Batched fsync of the detection streams
+                if now - last_sync >= 1:
+                    detection_log.sync_pending()
+                    last_sync = now
+
+                if self.stats_path and now - last_dump >= self.STATS_DUMP_INTERVAL:
+                    try:
+                        self.metrics.dump(self.stats_path)
+                    except OSError as e:
+                        print(f"Could not write stats to {self.stats_path}: {e}")
+                    last_dump = now
+
+                # Stop accepting while at the connection cap; the listen backlog holds the rest
+                if accepting and len(open_conns) >= self.max_connections:
+                    sel.unregister(server)
+                    accepting = False
+                elif not accepting and len(open_conns) < self.max_connections:
+                    sel.register(server, selectors.EVENT_READ, "accept")
+                    accepting = True
+        finally:
+            pool.shutdown(wait=True)
+            detection_log.close()
+            submission_journal.stop()
+            if self.stats_path:
+                try:
+                    self.metrics.dump(self.stats_path)
+                except OSError:
+                    pass
+            for conn in open_conns:
                 conn.close()
-        
-        server.close()
-            
-class AnimatedBubbleButton(QPushButton):
-    def __init__(self, text, parent=None, color=NU_BLUE, radius=25, text_col="white", animate=True):
-        super().__init__(text, parent)
-        self.default_color = color
-        self.hover_color = NU_HOVER if color == NU_BLUE else "#c5d9f7"
-        self.radius = radius
-        self.text_col = text_col
-        self.animate = animate
-        self.orig_geo = None
-        
-        # Add shadow effect for floating appearance
-        shadow = QGraphicsDropShadowEffect(self)
-        shadow.setBlurRadius(8)
-        shadow.setXOffset(0)
-        shadow.setYOffset(3)
-        shadow.setColor(QColor(0, 0, 0, 80))
-        self.setGraphicsEffect(shadow)
-        
-        # Set font to bold
-        font = QFont("Poppins", 15, QFont.Weight.Bold)
-        self.setFont(font)
-        
-        self.setStyleSheet(self._get_style(self.default_color))
-        self.setCursor(Qt.CursorShape.PointingHandCursor)
-        self._animation = QPropertyAnimation(self, b"geometry")
-        self._animation.setDuration(100)
-        self._animation.setEasingCurve(QEasingCurve.Type.OutQuad)
-
-    def _get_style(self, bg_color):
-        return f"QPushButton {{ background-color: {bg_color}; color: {self.text_col}; border-radius: {self.radius}px; font-size: 15px; font-weight: bold; border: none; font-family: Poppins; }}"
-
-    def enterEvent(self, event):
-        self.setStyleSheet(self._get_style(self.hover_color))
-        if self.animate:
-            if not self.orig_geo: self.orig_geo = self.geometry()
-            self._animation.setEndValue(QRect(self.orig_geo.x() - 8, self.orig_geo.y() - 3, self.orig_geo.width() + 16, self.orig_geo.height() + 6))
-            self._animation.start()
-
-    def leaveEvent(self, event):
-        self.setStyleSheet(self._get_style(self.default_color))
-        if self.animate and self.orig_geo:
-            self._animation.setEndValue(self.orig_geo)
-            self._animation.start()
-
-class IconSquareButton(QPushButton):
-    """Square button with large icon on top and small text below for the teacher menu"""
-    def __init__(self, text, icon_char="📋", parent=None, color=NU_BLUE, text_color="white", size=120):
+            sel.close()
+            server.close()
+            self._wake_r.close()
+            self._wake_w.close()
+
+    def _serve_connection(self, conn, addr):
+        """Worker: read one framed request, answer it and hand the socket back"""
+        keep_alive = False
+        try:
+            frame = network_logic.recv_frame(conn)
+            if frame is not None:
+                request_id, body = frame
+                started = time.perf_counter()
+                req = json.loads(body.decode('utf-8'))
+                req_type = req.get("type") if isinstance(req, dict) else None
+                try:
+                    resp = self.handle_request(req)
+                except Exception as e:
+                    print(f"Request from {addr[0]} failed: {e!r}")
+                    self.metrics.error(f"handler:{type(e).__name__}")
+                    resp = {"status": "error", "message": str(e)}
+                reply = resp if isinstance(resp, bytes) else network_logic.encode_message(resp)
+                network_logic.send_frame(conn, reply, request_id)
+                failed = not isinstance(resp, bytes) and resp.get("status") != "success"
+                self.metrics.record(str(req_type or "unknown"), time.perf_counter() - started,
+                                    network_logic.HEADER_SIZE + len(body), network_logic.HEADER_SIZE + len(reply), failed)
+                keep_alive = True
+        except (OSError, ValueError, network_logic.ProtocolError) as e:
+            print(f"Dropped connection from {addr[0]}: {e}")
+            if isinstance(e, TimeoutError):
+                self.metrics.error("timeout")
+            elif isinstance(e, network_logic.ProtocolError):
+                self.metrics.error("protocol")
+            elif isinstance(e, ValueError):
+                self.metrics.error("bad_json")
+            else:
+                self.metrics.error(f"connection:{type(e).__name__}")
+        finally:
+            self._handback.put((conn, addr, keep_alive))
+            self._wake()
+
+    def handle_request(self, req):
+        """Run a single decoded request; returns the response dict, or an already-encoded body"""
+        resp = {"status": "error"}
+
+        # 1. LOGIN: Roster index lookup
+        if req["type"] == "LOGIN":
+            classname = roster_index.lookup(req["name"], req["password"])
+            if classname is not None:
+                resp = {"status": "success", "classname": classname}
+
+        # 2. GET EXAM LIST
+        elif req["type"] == "GET_EXAM_LIST":
+            path = os.path.join(get_data_path("classes"), f"{req['classname']}.json")
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    resp = {"status": "success", "exams": json.load(f).get("exams", [])}
+
+        # 3. CHECK TAKEN: Verification logic
+        elif req["type"] == "CHECK_TAKEN":
+            log_path = os.path.join(get_data_path("logs"), f"{req['exam_name']}_{req['student_name']}.json")
+            if submission_journal.pending(log_path) is not None or os.path.exists(log_path):
+                resp = {"status": "success", "taken": True}
+            else:
+                resp = {"status": "success", "taken": False}
+
+        # 4. GET EXAM: Download content without answer keys (pre-encoded reply from the exam cache)
+        elif req["type"] == "GET_EXAM":
+            exam, prepared = exam_cache.get(req["exam_name"])
+            if prepared is not None:
+                resp = prepared[0]
+
+        # 5. SUBMIT LOG: Grade against the answer key, then save results
+        elif req["type"] == "SUBMIT_LOG":
+            exam, prepared = exam_cache.get(req["exam_name"])
+            if prepared is None:
+                # rejected: final, so the student's spool drops the packet instead of resending it.
+                # Only a missing exam file gets here; a failed read raises and is answered as a plain error.
+                return {"status": "error", "message": f"Unknown exam '{req['exam_name']}'", "rejected": True}
+            if "attempt_id" in req and not detection_log.valid_attempt_id(req["attempt_id"]):
+                return {"status": "error", "message": "Invalid attempt id", "rejected": True}
+            log_path = os.path.join(get_data_path("logs"), f"{req['exam_name']}_{req['student_name']}.json")
+            show_score = exam.get("settings", {}).get("show_score", True)
+
+            # A resend of an attempt already on record (the student never saw the ack): answer again, record nothing
+            if req.get("attempt_id"):
+                recorded = submission_journal.pending(log_path) or \
+                    results_store.attempt_summary(req.get("classname") or "", req["exam_name"], req["student_name"])
+                if recorded and recorded.get("attempt_id") == req["attempt_id"]:
+                    resp = {"status": "success", "duplicate": True}
+                    if show_score:
+                        resp.update(score=recorded["score"], total=recorded["total"])
+                    return resp
+
+            answer_key = prepared[1]
+            req["score"] = answer_key.grade(req.get("answers"))
+            req["total"] = answer_key.total
+
+            # Streamed clients send only the batches not yet delivered; the saved log gets the full stream
+            if "attempt_id" in req:
+                for seq, events in req.pop("event_batches", []):
+                    detection_log.append(req["exam_name"], req["student_name"], req["attempt_id"], seq, events)
+                detection_log.close_attempt(req["exam_name"], req["student_name"], req["attempt_id"])
+                req["detections"] = list(detection_log.read(req["exam_name"], req["student_name"], req["attempt_id"]))
+            live_events.publish({"kind": "submitted", "exam_name": req["exam_name"], "student_name": req["student_name"],
+                                 "classname": req.get("classname"), "events": [], "score": req["score"]})
+
+            # Acknowledge once journaled; the log file and index entry are written behind
+            submission_journal.submit(log_path, req)
+            resp = {"status": "success"}
+            if show_score:
+                resp.update(score=req["score"], total=req["total"])
+
+        # 7. LOG EVENTS: Append a batch of detections to the attempt's stream
+        elif req["type"] == "LOG_EVENTS":
+            if not detection_log.valid_attempt_id(req.get("attempt_id")):
+                return {"status": "error", "message": "Invalid attempt id", "rejected": True}
+            if detection_log.append(req["exam_name"], req["student_name"], req["attempt_id"], req["seq"], req.get("events", [])):
+                live_events.publish({"kind": "detections", "exam_name": req["exam_name"], "student_name": req["student_name"],
+                                     "classname": req.get("classname"), "events": req.get("events", [])})
+            resp = {"status": "success", "seq": req["seq"]}
+
+        # 6. GET DASHBOARD: Every assigned exam with this student's status in one reply
+        elif req["type"] == "GET_DASHBOARD":
+            path = os.path.join(get_data_path("classes"), f"{req['classname']}.json")
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    exam_names = json.load(f).get("exams", [])
+                resp = {"status": "success",
+                        "exams": [self._dashboard_entry(req["classname"], e, req["student_name"]) for e in exam_names]}
+
+        # 8. STATS: Request counters, latency percentiles, bytes and errors since the server started
+        elif req["type"] == "STATS":
+            resp = {"status": "success", "stats": self.metrics.snapshot()}
+
+        # 9. GET CLASS LIST: What the roster version in the discovery beacon stands for
+        elif req["type"] == "GET_CLASS_LIST":
+            classes = data_watcher.class_names()
+            resp = {"status": "success", "classes": classes, "version": network_logic.roster_version(classes)}
+
+        return resp
+
+    def _dashboard_entry(self, classname, exam_name, student_name):
+        """Status, score (when the exam shows it) and timing info for one assigned exam"""
+        entry = {"exam_name": exam_name, "taken": False}
+        exam, _ = exam_cache.get(exam_name)
+        settings, total = {}, None
+        if exam is not None:
+            settings = exam.get("settings", {})
+            total = len(exam.get("questions", []))
+        entry["duration_enabled"] = bool(settings.get("duration_enabled"))
+        entry["duration"] = settings.get("duration")
+        entry["question_count"] = total
+
+        log_path = os.path.join(get_data_path("logs"), f"{exam_name}_{student_name}.json")
+        attempt = submission_journal.pending(log_path) or results_store.attempt_summary(classname, exam_name, student_name)
+        if attempt is not None:
+            entry["taken"] = True
+            if settings.get("show_score", True):
+                entry["score"] = attempt["score"]
+        elif os.path.exists(log_path):
+            # A log with no index row for this class (legacy log, or the class was re-created) still counts as taken
+            entry["taken"] = True
+        return entry
+
+class LiveMonitorModel(QAbstractTableModel):
+    """One row per (exam, student) with a running detection count"""
+    HEADERS = ["Student", "Class", "Exam", "Detections", "Last Event", "Status"]
+    COUNT_COL, LAST_COL, STATUS_COL = 3, 4, 5
+
+    def __init__(self, parent=None):
         super().__init__(parent)
-        self.default_color = color
-        self.hover_color = NU_HOVER if color == NU_BLUE else "#c5d9f7"
-        self.text_color = text_color
-        self.size = size
-        
-        # Set fixed square size
-        self.setFixedSize(size, size)
-        self.setCursor(Qt.CursorShape.PointingHandCursor)
-        
-        # Add shadow effect for floating appearance
-        shadow = QGraphicsDropShadowEffect(self)
-        shadow.setBlurRadius(10)
-        shadow.setXOffset(0)
-        shadow.setYOffset(2)
-        shadow.setColor(QColor(0, 0, 0, 100))
-        self.setGraphicsEffect(shadow)
-        
-        # Create a layout for the button content with separate icon and text
-        layout = QVBoxLayout(self)
-        layout.setContentsMargins(0, 0, 0, 0)
-        layout.setSpacing(1)
-        
-        # Icon label (large - 32px)
-        icon_label = QLabel(icon_char)
-        icon_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        icon_font = QFont("Poppins", 40)
-        icon_label.setFont(icon_font)
-        icon_label.setStyleSheet(f"color: {self.text_color}; background: transparent; border: none;")
-        layout.addWidget(icon_label, alignment=Qt.AlignmentFlag.AlignCenter)
-        
-        # Text label (small - 8px) - NOW BOLD
-        text_label = QLabel(text)
-        text_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        text_font = QFont("Poppins", 12)
-        text_font.setBold(True)
-        text_label.setFont(text_font)
-        text_label.setStyleSheet(f"color: {self.text_color}; background: transparent; border: none;")
-        text_label.setWordWrap(True)
-        layout.addWidget(text_label, alignment=Qt.AlignmentFlag.AlignCenter)
-        
-        self._update_style(self.default_color)
-    
-    def _update_style(self, bg_color):
-        """Update button style"""
-        style = f"""
-            QPushButton {{
-                background-color: {bg_color};
-                border: none;
-                border-radius: 6px;
-                padding: 2px;
-            }}
-            QPushButton:hover {{
-                background-color: {self.hover_color};
-            }}
-        """
-        self.setStyleSheet(style)
-    
-    def enterEvent(self, event):
-        self._update_style(self.hover_color)
-    
-    def leaveEvent(self, event):
-        self._update_style(self.default_color)
+        self._rows = []   # [student, class, exam, count, last_event, status]
+        self._index = {}  # (exam, student) -> row number
+        self.submitted_count = 0
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return str(row[index.column()])
+        if role == Qt.ItemDataRole.TextAlignmentRole and index.column() == self.COUNT_COL:
+            return Qt.AlignmentFlag.AlignCenter
+        if role == Qt.ItemDataRole.ForegroundRole and index.column() == self.STATUS_COL:
+            return QColor("darkgreen") if row[self.STATUS_COL] == "SUBMITTED" else QColor("#c62828")
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def apply_events(self, events):
+        """Fold a batch of bus events into the table with one insert and one dataChanged"""
+        first_changed = None
+        new_rows = []
+        for ev in events:
+            key = (ev["exam_name"], ev["student_name"])
+            row_no = self._index.get(key)
+            if row_no is None:
+                row_no = self._index[key] = len(self._rows) + len(new_rows)
+                new_rows.append([ev["student_name"], ev.get("classname") or "-", ev["exam_name"], 0, "-", "IN PROGRESS"])
+            row = new_rows[row_no - len(self._rows)] if row_no >= len(self._rows) else self._rows[row_no]
+            if ev["events"]:
+                row[self.COUNT_COL] += sum(e.get("count", 1) for e in ev["events"])
+                row[self.LAST_COL] = ev["events"][-1].get("event", "-")
+            if ev["kind"] == "submitted" and row[self.STATUS_COL] != "SUBMITTED":
+                row[self.STATUS_COL] = "SUBMITTED"
+                self.submitted_count += 1
+            if row_no < len(self._rows):
+                first_changed = row_no if first_changed is None else min(first_changed, row_no)
+
+        if first_changed is not None:
+            self.dataChanged.emit(self.index(first_changed, 0), self.index(len(self._rows) - 1, len(self.HEADERS) - 1))
+        if new_rows:
+            self.beginInsertRows(QModelIndex(), len(self._rows), len(self._rows) + len(new_rows) - 1)
+            self._rows.extend(new_rows)
+            self.endInsertRows()
+
+class LiveMonitor(QObject):
+    """Live dashboard state for the server's lifetime: one bus subscription feeding one model and feed"""
+    REFRESH_MS = 250
+    FEED_LINES = 500
+    MAX_EVENTS_PER_TICK = 5000
+
+    updated = pyqtSignal(list)  # feed lines added by the last tick
+
+    def __init__(self, bus):
+        super().__init__()
+        self.bus = bus
+        self.model = LiveMonitorModel()
+        self.feed = deque(maxlen=self.FEED_LINES)
+        self._sub = None
+        self._timer = None
+
+    def start(self):
+        """Subscribe to the bus (once) and start draining it; called when the server starts"""
+        if self._sub is not None:
+            return
+        self._sub = self.bus.subscribe()
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.drain)
+        self._timer.start(self.REFRESH_MS)
+
+    def summary(self):
+        rows, submitted = self.model.rowCount(), self.model.submitted_count
+        if not rows:
+            return "Waiting for students..."
+        return f"{rows} students seen — {rows - submitted} in progress, {submitted} submitted"
+
+    def drain(self):
+        """Timer tick: apply everything that arrived since the last tick in one model update"""
+        batch = []
+        try:
+            while len(batch) < self.MAX_EVENTS_PER_TICK:
+                batch.append(self._sub.popleft())
+        except IndexError:
+            pass
+        if not batch:
+            return
+
+        self.model.apply_events(batch)
+
+        now = time.strftime("%H:%M:%S")
+        lines = [f"{now}  {ev['student_name']} [{ev['exam_name']}]  {e.get('event')}"
+                 for ev in batch for e in ev["events"]]
+        lines += [f"{now}  {ev['student_name']} [{ev['exam_name']}]  SUBMITTED (score {ev.get('score')})"
+                  for ev in batch if ev["kind"] == "submitted"]
+        lines = lines[-self.FEED_LINES:]
+        self.feed.extend(lines)
+        self.updated.emit(lines)
+
+live_monitor = LiveMonitor(live_events)
+
+class LogSummaryModel(QAbstractTableModel):
+    """Logs viewer rows: only the per-student summary, never the detections themselves"""
+    HEADERS = ["Status", "Student", "Score", "Detections"]
+    SCORE_COL, DETECTIONS_COL = 2, 3
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []  # (student name, attempt summary dict or None)
+        self.loading = False
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        student, summary = self._rows[index.row()]
+        col = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            if col == 0:
+                return "✓ COMPLETED" if summary else "○ PENDING  "
+            if col == 1:
+                return student
+            if col == self.SCORE_COL:
+                return str(summary["score"]) if summary and summary.get("score") is not None else "-"
+            if col == self.DETECTIONS_COL:
+                return str(summary.get("detection_count", 0)) if summary else "-"
+        if role == Qt.ItemDataRole.ForegroundRole and col == 0:
+            return QColor("darkgreen") if summary else QColor("gray")
+        if role == Qt.ItemDataRole.TextAlignmentRole and col in (self.SCORE_COL, self.DETECTIONS_COL):
+            return Qt.AlignmentFlag.AlignCenter
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            if section == self.SCORE_COL and self.loading:
+                return "Score (loading...)"
+            return self.HEADERS[section]
+        return None
+
+    def set_loading(self, loading):
+        self.loading = loading
+        self.headerDataChanged.emit(Qt.Orientation.Horizontal, 0, len(self.HEADERS) - 1)
+
+    def clear(self):
+        self.beginResetModel()
+        self._rows = []
+        self.endResetModel()
+
+    def append_rows(self, rows):
+        if rows:
+            self.beginInsertRows(QModelIndex(), len(self._rows), len(self._rows) + len(rows) - 1)
+            self._rows.extend(rows)
+            self.endInsertRows()
+
+    def row_at(self, row):
+        return self._rows[row]
+
+    def update_student(self, student, summary):
+        """Replace one student's summary in place; returns False if the student is not listed"""
+        for row, (name, _old) in enumerate(self._rows):
+            if name == student:
+                self._rows[row] = (student, summary)
+                self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.HEADERS) - 1))
+                return True
+        return False
+
+    def scores(self):
+        return [self.index(r, self.SCORE_COL).data() for r in range(len(self._rows))]
+
+class DetectionListModel(QAbstractTableModel):
+    """One attempt's raw detections, handed to the view a page at a time through fetchMore"""
+    HEADERS = ["Time", "Event", "Count"]
+    PAGE_SIZE = 500
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._detections = []
+        self._shown = 0
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._shown
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._shown < len(self._detections)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        count = min(self.PAGE_SIZE, len(self._detections) - self._shown)
+        if count > 0:
+            self.beginInsertRows(QModelIndex(), self._shown, self._shown + count - 1)
+            self._shown += count
+            self.endInsertRows()
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        det = self._detections[index.row()]
+        col = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            if col == 0:
+                first = det.get("timestamp_relative_sec")
+                last = det.get("last_relative_sec", first)
+                return f"{first}s" if first == last else f"{first}-{last}s"
+            if col == 1:
+                return det.get("event")
+            if col == 2:
+                return str(det.get("count", 1))
+        if role == Qt.ItemDataRole.ForegroundRole and col == 1:
+            return QColor("red")
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def set_detections(self, detections):
+        self.beginResetModel()
+        self._detections = detections or []
+        self._shown = min(self.PAGE_SIZE, len(self._detections))
+        self.endResetModel()
+
+def summarize_detections(detections):
+    """Per event type: [event, records, total occurrences, first sec, last sec], busiest first"""
+    by_event = {}
+    for det in detections:
+        first = det.get("timestamp_relative_sec")
+        last = det.get("last_relative_sec", first)
+        entry = by_event.get(det.get("event"))
+        if entry is None:
+            by_event[det.get("event")] = [det.get("event"), 1, det.get("count", 1), first, last]
+        else:
+            entry[1] += 1
+            entry[2] += det.get("count", 1)
+            entry[4] = last
+    return sorted(by_event.values(), key=lambda e: -e[2])
+
+class LoadToken:
+    """Identifies one background load; cancelling it stops the worker and silences its results"""
+    def __init__(self, kind):
+        self.kind = kind
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+class LoaderSignals(QObject):
+    chunk = pyqtSignal(object, list)  # token, rows
+    done = pyqtSignal(object)         # token
+    failed = pyqtSignal(object, str)  # token, error message
+
+class BackgroundLoader(QRunnable):
+    """Runs a generator on the global QThreadPool and streams each yielded chunk to the UI thread"""
+    def __init__(self, produce, token):
+        super().__init__()
+        self.produce = produce
+        self.token = token
+        self.signals = LoaderSignals()
+
+    def run(self):
+        try:
+            for rows in self.produce():
+                if self.token.cancelled:
+                    return
+                self.signals.chunk.emit(self.token, rows)
+        except Exception as e:
+            self.signals.failed.emit(self.token, str(e))
+            return
+        if not self.token.cancelled:
+            self.signals.done.emit(self.token)
+
+LOG_ROWS_CHUNK = 200
+
+def load_class_names():
+    """Worker: every class file name, sorted"""
+    classes_dir = get_data_path("classes")
+    if os.path.exists(classes_dir):
+        yield sorted(f[:-5] for f in os.listdir(classes_dir) if f.endswith(".json"))
+
+def load_class_exams(class_name):
+    """Worker: the exams assigned to one class"""
+    path = os.path.join(get_data_path("classes"), f"{class_name}.json")
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            yield json.load(f).get("exams", [])
+
+def load_log_rows(c_name, e_name, only_taken):
+    """Worker: (student, attempt summary or None) for the roster, in chunks of LOG_ROWS_CHUNK"""
+    master_students = []
+    if os.path.exists(os.path.join(get_data_path("classes"), f"{c_name}.json")):
+        with open(os.path.join(get_data_path("classes"), f"{c_name}.json"), "r", encoding="utf-8") as f:
+            master_students = json.load(f).get("students", [])
+
+    # One indexed query for every submitted attempt; full reports are loaded on click
+    results_store.ensure_synced()
+    attempts = results_store.attempts_for(c_name, e_name)
+
+    rows = []
+    for s_obj in master_students:
+        log_data = attempts.get(s_obj["name"])
+        if only_taken and not log_data:
+            continue
+        rows.append((s_obj["name"], log_data))
+        if len(rows) >= LOG_ROWS_CHUNK:
+            yield rows
+            rows = []
+    if rows:
+        yield rows
 
 class TeacherWindow(QWidget):
     def __init__(self, page_key, portal):
@@ -241,9 +810,11 @@ class TeacherWindow(QWidget):
         self.current_questions = []
         self.editing_index = None
         self.current_class_data = {}
+        self.log_tokens = {}  # load kind -> LoadToken of the load currently allowed to touch the UI
 
         if page_key == "exam": self.setup_exam_builder()
         elif page_key == "logs": self.setup_logs()
+        elif page_key == "live": self.setup_live_monitor()
         elif page_key == "create_class": self.setup_create_class()
         elif page_key == "manage_class": self.setup_manage_class()
 
@@ -588,8 +1159,8 @@ class TeacherWindow(QWidget):
         }
         
         os.makedirs(get_data_path("exams"), exist_ok=True)
-        with open(os.path.join(get_data_path("exams"), f"{name}.json"), "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
+        storage.write_json(os.path.join(get_data_path("exams"), f"{name}.json"), data)
+        exam_cache.invalidate(name)
             
         QMessageBox.information(self, "Success", f"Exam '{name}' Saved Successfully!")
         self.return_to_teacher_menu()
@@ -648,27 +1219,51 @@ class TeacherWindow(QWidget):
         # 4.2 Main Content Area
         content_split = QHBoxLayout()
         
-        self.log_tree = QTreeWidget()
+        self.log_model = LogSummaryModel(page)
+        self.log_detail_cache = OrderedDict()  # (class, exam, student) -> full report, LRU
+        self.log_tree = QTableView()
+        self.log_tree.setModel(self.log_model)
         self.log_tree.setStyleSheet("background-color: #ffffff; border-radius: 4px;")
-        self.log_tree.setRootIsDecorated(False) # Hides the expansion arrow space
-        self.log_tree.setIndentation(0)
-        self.log_tree.setHeaderLabels(["Status", "Student", "Score"])
+        self.log_tree.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.log_tree.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.log_tree.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.log_tree.verticalHeader().setVisible(False)
+        self.log_tree.setShowGrid(False)
         # Set fixed widths for better alignment
-        self.log_tree.setColumnWidth(0, 130)
-        self.log_tree.setColumnWidth(1, 150)
-        self.log_tree.setFixedWidth(380)
-        
-        # Use Monospace font for perfect status alignment
-        self.log_tree.itemClicked.connect(self.display_log_details)
+        self.log_tree.setColumnWidth(0, 120)
+        self.log_tree.setColumnWidth(1, 130)
+        self.log_tree.setColumnWidth(2, 55)
+        self.log_tree.horizontalHeader().setStretchLastSection(True)
+        self.log_tree.setFixedWidth(400)
+        
+        # Arrow-key browsing re-renders through the detail cache as well
+        self.log_tree.selectionModel().currentRowChanged.connect(lambda current, _previous: self.display_log_details(current))
         self.log_tree.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.log_tree.customContextMenuRequested.connect(self.on_log_tree_context_menu)
+        data_watcher.attempt_changed.connect(self.on_attempt_changed)
         content_split.addWidget(self.log_tree)
         
+        detail_col = QVBoxLayout()
         self.log_detail = QTextEdit()
         self.log_detail.setStyleSheet("background-color: #ffffff; border-radius: 4px; padding: 4px;")
         self.log_detail.setReadOnly(True)
         self.log_detail.setPlaceholderText("Select a student to view report...")
-        content_split.addWidget(self.log_detail)
+        detail_col.addWidget(self.log_detail, 2)
+        
+        # Raw events live in a view so thousands of them cost nothing until scrolled to
+        self.log_events_model = DetectionListModel(page)
+        self.log_events_view = QTableView()
+        self.log_events_view.setModel(self.log_events_model)
+        self.log_events_view.setStyleSheet("background-color: #ffffff; border-radius: 4px;")
+        self.log_events_view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.log_events_view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.log_events_view.verticalHeader().setVisible(False)
+        self.log_events_view.verticalHeader().setDefaultSectionSize(22)
+        self.log_events_view.setColumnWidth(0, 90)
+        self.log_events_view.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
+        self.log_events_view.setColumnWidth(2, 60)
+        detail_col.addWidget(self.log_events_view, 3)
+        content_split.addLayout(detail_col)
         
         layout.addLayout(content_split)
 
@@ -681,6 +1276,11 @@ class TeacherWindow(QWidget):
         copy_btn.clicked.connect(self.copy_scores_to_clipboard)
         btn_frame.addWidget(copy_btn)
 
+        regrade_btn = AnimatedBubbleButton("Re-grade Exam", color="#6c757d", radius=8, animate=False)
+        regrade_btn.setMinimumHeight(42)
+        regrade_btn.clicked.connect(self.regrade_current_exam)
+        btn_frame.addWidget(regrade_btn)
+
         refresh_btn = AnimatedBubbleButton("Refresh List", color=NU_BLUE, radius=8, animate=False)
         refresh_btn.setMinimumHeight(42)
         refresh_btn.clicked.connect(self.init_log_filters)
@@ -692,101 +1292,193 @@ class TeacherWindow(QWidget):
         self.stack.setCurrentWidget(page)
         self.init_log_filters()
 
+    def start_log_load(self, kind, produce):
+        """Run `produce` on the thread pool; any older load of the same kind is cancelled"""
+        previous = self.log_tokens.get(kind)
+        if previous is not None:
+            previous.cancel()
+        token = self.log_tokens[kind] = LoadToken(kind)
+        loader = BackgroundLoader(produce, token)
+        loader.signals.chunk.connect(self.on_log_load_chunk)
+        loader.signals.done.connect(self.on_log_load_done)
+        loader.signals.failed.connect(self.on_log_load_failed)
+        QThreadPool.globalInstance().start(loader)
+
     def init_log_filters(self):
         """Initializes the class filter dropdown"""
         self.log_class_filter.clear()
-        if not os.path.exists(get_data_path("classes")): return
-        classes = [f[:-5] for f in os.listdir(get_data_path("classes")) if f.endswith(".json")]
-        if classes:
-            self.log_class_filter.addItems(sorted(classes))
+        self.start_log_load("classes", load_class_names)
 
     def on_log_class_selected(self, class_name):
         """Updates the exam filter when a class is chosen"""
         self.log_exam_filter.clear()
-        path = os.path.join(get_data_path("classes"), f"{class_name}.json")
-        if os.path.exists(path):
-            with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                exams = data.get("exams", [])
-                self.log_exam_filter.addItems(exams)
+        if class_name:
+            self.start_log_load("exams", lambda: load_class_exams(class_name))
 
     def refresh_log_tree(self):
         """Displays all students in order and highlights status"""
-        self.log_tree.clear()
+        self.log_model.clear()
+        self.log_detail_cache.clear()
         c_name = self.log_class_filter.currentText()
         e_name = self.log_exam_filter.currentText()
-        if not c_name or not e_name: return
-
-        master_students = []
-        if os.path.exists(os.path.join(get_data_path("classes"), f"{c_name}.json")):
-            with open(os.path.join(get_data_path("classes"), f"{c_name}.json"), "r", encoding="utf-8") as f:
-                master_students = json.load(f).get("students", [])
-
-        for s_obj in master_students:
-            s_name = s_obj["name"]
-            log_path = os.path.join(get_data_path("logs"), f"{e_name}_{s_name}.json")
-            log_data = None
-            
-            if os.path.exists(log_path):
-                with open(log_path, "r", encoding="utf-8") as f:
-                    log_data = json.load(f)
+        if not c_name or not e_name:
+            # Nothing to show; make sure a stale load cannot repopulate the tree
+            if self.log_tokens.get("rows") is not None:
+                self.log_tokens.pop("rows").cancel()
+            return
 
-            if self.show_only_taken.isChecked() and not log_data:
-                continue
-
-            status = "✓ COMPLETED" if log_data else "○ PENDING  "
-            score = str(log_data.get("score", "-")) if log_data else "-"
-            
-            item = QTreeWidgetItem([status, s_name, score])
-            item.setTextAlignment(2, Qt.AlignmentFlag.AlignCenter)
-            
-            if log_data:
-                item.setForeground(0, QColor("darkgreen"))
-                item.setData(0, Qt.ItemDataRole.UserRole, log_data)
-            else:
-                item.setForeground(0, QColor("gray"))
-            
-            self.log_tree.addTopLevelItem(item)
+        only_taken = self.show_only_taken.isChecked()
+        self.log_model.set_loading(True)
+        self.start_log_load("rows", lambda: load_log_rows(c_name, e_name, only_taken))
+
+    def on_log_load_chunk(self, token, rows):
+        if self.log_tokens.get(token.kind) is not token:
+            return  # superseded by a newer load
+        if token.kind == "classes":
+            self.log_class_filter.addItems(rows)
+        elif token.kind == "exams":
+            self.log_exam_filter.addItems(rows)
+        elif token.kind == "rows":
+            self.log_model.append_rows(rows)
+
+    def on_log_load_done(self, token):
+        if self.log_tokens.get(token.kind) is token and token.kind == "rows":
+            self.log_model.set_loading(False)
+
+    def on_log_load_failed(self, token, message):
+        if self.log_tokens.get(token.kind) is token:
+            self.log_model.set_loading(False)
+            QMessageBox.warning(self, "Load Error", f"Could not load exam logs:\n{message}")
 
     def copy_scores_to_clipboard(self):
         """Copies only the scores column for easy pasting into an existing Excel column"""
-        output = ""
-        
-        for i in range(self.log_tree.topLevelItemCount()):
-            it = self.log_tree.topLevelItem(i)
-            # Column index 2 is the 'Score' column in your TreeWidget
-            score = it.text(2)
-            output += f"{score}\n"
+        output = "".join(f"{score}\n" for score in self.log_model.scores())
         
         QApplication.clipboard().setText(output)
         QMessageBox.information(self, "Excel Copy", "Scores column copied to clipboard!")
 
-    def display_log_details(self, item):
-        self.selected_log_item = item  # Track the selected item for deletion
-        d = item.data(0, Qt.ItemDataRole.UserRole)
+    def regrade_current_exam(self):
+        """Re-score every submitted attempt of the selected exam against its current answer key"""
+        e_name = self.log_exam_filter.currentText()
+        if not e_name: return
+        try:
+            exam, prepared = exam_cache.get(e_name)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "Error", f"Could not read exam '{e_name}':\n{e}")
+            return
+        if prepared is None:
+            QMessageBox.warning(self, "Error", f"Exam '{e_name}' no longer exists.")
+            return
+        answer_key = prepared[1]
+
+        # Submissions still queued in the journal supersede their log files; they are re-graded in the queue
+        queued = {key: record for key, record in submission_journal.pending_items() if record.get("exam_name") == e_name}
+
+        # Only attempts that carry raw answers can be re-graded (older logs stored just the score)
+        attempts = [(key, dict(record), True) for key, record in queued.items() if "answers" in record]
+        skipped = 0
+        prefix = f"{e_name}_"
+        for filename in os.listdir(get_data_path("logs")):
+            if filename.startswith(prefix) and filename.endswith(".json"):
+                path = os.path.join(get_data_path("logs"), filename)
+                if path in queued:
+                    continue
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        log_data = json.load(f)
+                except (OSError, ValueError) as e:
+                    print(f"Re-grade skipped {filename}: {e}")
+                    skipped += 1
+                    continue
+                if isinstance(log_data, dict) and log_data.get("exam_name") == e_name and "answers" in log_data:
+                    attempts.append((path, log_data, False))
+
+        scores = answer_key.grade_many(d["answers"] for _, d, _ in attempts)
+        changed = 0
+        for (path, log_data, is_queued), score in zip(attempts, scores):
+            if log_data.get("score") != score or log_data.get("total") != answer_key.total:
+                log_data["score"], log_data["total"] = score, answer_key.total
+                if is_queued:
+                    submission_journal.submit(path, log_data)  # replaces the queued record
+                else:
+                    storage.write_json(path, log_data)
+                    results_store.record_attempt(log_data, path)
+                changed += 1
+
+        self.refresh_log_tree()
+        msg = f"Re-graded {len(attempts)} attempts ({changed} scores changed)."
+        if skipped:
+            msg += f"\n{skipped} unreadable log files were skipped."
+        QMessageBox.information(self, "Re-grade", msg)
+
+    def on_attempt_changed(self, class_name, exam_name, student_name):
+        """A submission arrived: update just that student's row (and report, if it is open)"""
+        if (class_name, exam_name) != (self.log_class_filter.currentText(), self.log_exam_filter.currentText()):
+            return
+        self.log_detail_cache.pop((class_name, exam_name, student_name), None)
+        summary = results_store.attempt_summary(class_name, exam_name, student_name)
+        if not self.log_model.update_student(student_name, summary):
+            # Hidden by "Show Only Completed" until now; a load still running will list it itself
+            if self.log_model.loading or summary is None:
+                return
+            self.log_model.append_rows([(student_name, summary)])
+        current = self.log_tree.currentIndex()
+        if current.isValid() and self.log_model.row_at(current.row())[0] == student_name:
+            self.display_log_details(current)
+
+    LOG_DETAIL_CACHE_SIZE = 16
+
+    def get_log_detail(self, student_name):
+        """Full report for one student of the current class/exam, through a small LRU cache"""
+        key = (self.log_class_filter.currentText(), self.log_exam_filter.currentText(), student_name)
+        if key in self.log_detail_cache:
+            self.log_detail_cache.move_to_end(key)
+            return self.log_detail_cache[key]
+        detail = results_store.attempt_detail(*key)
+        self.log_detail_cache[key] = detail
+        while len(self.log_detail_cache) > self.LOG_DETAIL_CACHE_SIZE:
+            self.log_detail_cache.popitem(last=False)
+        return detail
+
+    def display_log_details(self, index):
+        if not index.isValid():
+            return
+        student_name, summary = self.log_model.row_at(index.row())
+        d = self.get_log_detail(student_name) if summary else None
         if not d:
+            self.log_events_model.set_detections([])
             self.log_detail.setHtml("<h3 style='color:gray;'>No data submitted yet.</h3>")
             return
         
-        # Build Report HTML
-        html = f"<h2>Report: {d.get('student_name')}</h2>"
-        html += f"<b>Score:</b> {d.get('score')} / {len(d.get('answers', []))}<br/>"
-        html += f"<b>Duration:</b> {int(d.get('duration_taken_sec', 0)) // 60}m {int(d.get('duration_taken_sec', 0)) % 60}s<br/>"
-        html += "<hr/><b>Anti-Cheat Events:</b><br/>"
+        # Build Report HTML: header plus one line per event type; raw events go to the list view
+        detections = d.get("detections", [])
+        duration = int(d.get('duration_taken_sec', 0))
+        parts = [
+            f"<h2>Report: {d.get('student_name')}</h2>",
+            f"<b>Score:</b> {d.get('score')} / {d.get('total') or len(d.get('answers', []))}<br/>",
+            f"<b>Duration:</b> {duration // 60}m {duration % 60}s<br/>",
+            f"<hr/><b>Anti-Cheat Events:</b> {sum(det.get('count', 1) for det in detections)}<br/>",
+        ]
+        if detections:
+            parts.append("<table cellpadding='3'><tr><th align='left'>Event</th><th>Times</th><th>First</th><th>Last</th></tr>")
+            for event, _records, total, first, last in summarize_detections(detections):
+                parts.append(f"<tr><td><font color='red'>{event}</font></td><td align='center'>{total}</td>"
+                             f"<td align='center'>{first}s</td><td align='center'>{last}s</td></tr>")
+            parts.append("</table>")
+        else:
+            parts.append("<font color='darkgreen'>None</font>")
         
-        for det in d.get("detections", []):
-            html += f"<font color='red'>[{det.get('timestamp_relative_sec')}s] {det.get('event')}</font><br/>"
-            
-        self.log_detail.setHtml(html)
+        self.log_detail.setHtml("".join(parts))
+        self.log_events_model.set_detections(detections)
         
     def on_log_tree_context_menu(self, position):
         """Show context menu for log tree right-click"""
-        item = self.log_tree.itemAt(position)
-        if item is None:
+        index = self.log_tree.indexAt(position)
+        if not index.isValid():
             return
         
-        # Check if this item has log data (no data means pending exam)
-        log_data = item.data(0, Qt.ItemDataRole.UserRole)
+        # Check if this row has log data (no data means pending exam)
+        student_name, log_data = self.log_model.row_at(index.row())
         if not log_data:
             QMessageBox.information(self, "No Attempt", "This student has not attempted the exam yet.")
             return
@@ -797,13 +1489,12 @@ class TeacherWindow(QWidget):
         delete_action = context_menu.addAction("🗑️ Delete This Attempt")
         
         # Show menu and handle selection
-        action = context_menu.exec(self.log_tree.mapToGlobal(position))
+        action = context_menu.exec(self.log_tree.viewport().mapToGlobal(position))
         if action == delete_action:
-            self.delete_exam_attempt(item)
+            self.delete_exam_attempt(student_name)
 
-    def delete_exam_attempt(self, item):
+    def delete_exam_attempt(self, student_name):
         """Delete the exam attempt for a student"""
-        student_name = item.text(1)  # Column 1 is Student name
         exam_name = self.log_exam_filter.currentText()
         
         # Confirm deletion
@@ -818,33 +1509,36 @@ class TeacherWindow(QWidget):
             return
         
         try:
-            # Remove the log file
+            # Drop a submission still queued for writing first, so the writer cannot recreate the log
             log_path = os.path.join(get_data_path("logs"), f"{exam_name}_{student_name}.json")
-            if os.path.exists(log_path):
-                os.remove(log_path)
+            class_name = self.log_class_filter.currentText()
+            attempt = submission_journal.discard(log_path) or results_store.attempt_summary(class_name, exam_name, student_name)
+
+            # Remove the log file, its index entry and its detection stream
+            storage.remove_file(log_path)
+            results_store.delete_attempt(class_name, exam_name, student_name)
+            if attempt and detection_log.valid_attempt_id(attempt.get("attempt_id")):
+                detection_log.remove_attempt(exam_name, student_name, attempt["attempt_id"])
             
             # Also remove from class data if it exists
-            class_name = self.log_class_filter.currentText()
             class_path = os.path.join(get_data_path("classes"), f"{class_name}.json")
             if os.path.exists(class_path):
-                with open(class_path, "r", encoding="utf-8") as f:
-                    class_data = json.load(f)
-                
-                # Find and update the student's exam status
-                for student in class_data.get("students", []):
-                    if student["name"] == student_name:
-                        if "exam_statuses" in student:
-                            if exam_name in student["exam_statuses"]:
-                                student["exam_statuses"][exam_name] = "pending"
-                        break
+                def reset_status(class_data):
+                    # Find and update the student's exam status
+                    for student in class_data.get("students", []):
+                        if student["name"] == student_name:
+                            if "exam_statuses" in student:
+                                if exam_name in student["exam_statuses"]:
+                                    student["exam_statuses"][exam_name] = "pending"
+                            break
                 
                 # Save updated class data
-                with open(class_path, "w", encoding="utf-8") as f:
-                    json.dump(class_data, f, indent=2, ensure_ascii=False)
+                storage.update_json(class_path, reset_status)
             
             # Refresh the log tree
             self.refresh_log_tree()
             self.log_detail.clear()
+            self.log_events_model.set_detections([])
             
             QMessageBox.information(self, "Success", f"Exam attempt for {student_name} has been deleted.")
             
@@ -852,6 +1546,72 @@ class TeacherWindow(QWidget):
             QMessageBox.critical(self, "Error", f"Failed to delete exam attempt:\n{str(e)}")
         
         
+    # ===================== 4B. LIVE MONITOR =====================
+
+    def setup_live_monitor(self):
+        page = QWidget()
+        page.setStyleSheet("background-color: #F8DD70;")
+        outer_layout = QVBoxLayout(page)
+        outer_layout.setContentsMargins(20, 20, 20, 20)
+        outer_layout.setSpacing(15)
+        
+        # Header row with back button
+        header_row = QWidget()
+        header_row.setStyleSheet("background-color: #F8DD70;")
+        header_layout = QHBoxLayout(header_row)
+        back_btn = AnimatedBubbleButton("← Back", radius=8, animate=False)
+        back_btn.setFixedSize(90, 34)
+        back_btn.clicked.connect(self.return_to_teacher_menu)
+        header_layout.addWidget(back_btn)
+        header_layout.addStretch()
+        title = QLabel("Live Monitor")
+        title.setStyleSheet("font-size: 22px; font-weight: bold; color: #0B2C5D; background-color: #F8DD70;")
+        title.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        header_layout.addWidget(title)
+        header_layout.addStretch()
+        placeholder = QWidget()
+        placeholder.setFixedSize(90, 34)
+        header_layout.addWidget(placeholder)
+        header_layout.setContentsMargins(0, 0, 0, 0)
+        outer_layout.addWidget(header_row)
+
+        self.live_summary = QLabel(live_monitor.summary())
+        self.live_summary.setStyleSheet("font-size: 13px; color: #0B2C5D;")
+        outer_layout.addWidget(self.live_summary)
+
+        # Per-student counters, kept by live_monitor for the server's lifetime (only changed rows are repainted)
+        live_monitor.start()
+        self.live_table = QTableView()
+        self.live_table.setModel(live_monitor.model)
+        self.live_table.setStyleSheet("background-color: #ffffff; border-radius: 4px;")
+        self.live_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.live_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.live_table.verticalHeader().setVisible(False)
+        self.live_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        outer_layout.addWidget(self.live_table, 3)
+
+        # Rolling feed of the most recent events, starting with those seen before the page was opened
+        outer_layout.addWidget(QLabel("<b>Recent Events</b>"))
+        self.live_feed = QPlainTextEdit()
+        self.live_feed.setReadOnly(True)
+        self.live_feed.setMaximumBlockCount(LiveMonitor.FEED_LINES)
+        self.live_feed.setStyleSheet("background-color: #ffffff; color: #d32f2f; border-radius: 4px;")
+        if live_monitor.feed:
+            self.live_feed.appendPlainText("\n".join(live_monitor.feed))
+        outer_layout.addWidget(self.live_feed, 2)
+
+        # The page only renders; it stops listening when it is destroyed
+        live_feed, live_summary = self.live_feed, self.live_summary
+        def on_update(lines):
+            if lines:
+                live_feed.appendPlainText("\n".join(lines))
+            live_summary.setText(live_monitor.summary())
+        live_monitor.updated.connect(on_update)
+        page.destroyed.connect(lambda *_: live_monitor.updated.disconnect(on_update))
+
+        self.stack.addWidget(page)
+        self.stack.setCurrentWidget(page)
+
     # ===================== 5. CREATE CLASS (FIXED) =====================
     def setup_create_class(self):
         page = QWidget()
@@ -998,8 +1758,8 @@ class TeacherWindow(QWidget):
         
         os.makedirs(get_data_path("classes"), exist_ok=True)
         filepath = os.path.join(get_data_path("classes"), f"{name}.json")
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
+        storage.write_json(filepath, data)
+        roster_index.reload(name)
         
         QMessageBox.information(self, "Success", f"Class '{name}' created with {len(students)} students.")
         self.return_to_teacher_menu()
@@ -1046,6 +1806,9 @@ class TeacherWindow(QWidget):
         self.refresh_class_list()
         self.class_picker.currentTextChanged.connect(self.load_selected_class_data)
         top_row.addWidget(self.class_picker, 1)
+        data_watcher.classes_changed.connect(self.on_classes_changed)
+        data_watcher.class_changed.connect(self.on_class_changed)
+        data_watcher.start()
         left_container.addLayout(top_row)
 
         # Lists Display (2 columns)
@@ -1128,6 +1891,21 @@ class TeacherWindow(QWidget):
             else:
                 self.class_picker.addItems(classes)
 
+    def on_classes_changed(self, classes):
+        """Classes were added or removed on disk: rebuild the picker, keeping the current choice"""
+        current = self.class_picker.currentText()
+        self.class_picker.blockSignals(True)
+        self.refresh_class_list()
+        self.class_picker.blockSignals(False)
+        if current in classes:
+            self.class_picker.setCurrentText(current)
+        else:
+            self.load_selected_class_data()
+
+    def on_class_changed(self, class_name):
+        if class_name == self.class_picker.currentText():
+            self.load_selected_class_data()
+
     def load_selected_class_data(self):
         c_name = self.class_picker.currentText()
         path = os.path.join(get_data_path("classes"), f"{c_name}.json")
@@ -1140,7 +1918,7 @@ class TeacherWindow(QWidget):
                 item.widget().deleteLater()
         
         if os.path.exists(path):
-            with open(path, "r") as f:
+            with open(path, "r", encoding="utf-8") as f:
                 self.current_class_data = json.load(f)
                 students = self.current_class_data.get("students", [])
                 self.manage_student_list.setRowCount(len(students))
@@ -1246,8 +2024,8 @@ class TeacherWindow(QWidget):
                 # Save back to the JSON file
                 class_name = self.class_picker.currentText()
                 try:
-                    with open(os.path.join(get_data_path("classes"), f"{class_name}.json"), "w", encoding="utf-8") as f:
-                        json.dump(self.current_class_data, f, indent=4, ensure_ascii=False)
+                    storage.write_json(os.path.join(get_data_path("classes"), f"{class_name}.json"), self.current_class_data)
+                    roster_index.reload(class_name)
                     
                     QMessageBox.information(dialog, "Success", f"Added {len(new_students)} students.")
                     dialog.accept()
@@ -1272,8 +2050,7 @@ class TeacherWindow(QWidget):
             exam_name = listw.currentItem().text()
             if exam_name not in self.current_class_data.get("exams", []):
                 self.current_class_data.setdefault("exams", []).append(exam_name)
-                with open(os.path.join(get_data_path("classes"), f"{self.class_picker.currentText()}.json"), "w") as f:
-                    json.dump(self.current_class_data, f, indent=4)
+                storage.write_json(os.path.join(get_data_path("classes"), f"{self.class_picker.currentText()}.json"), self.current_class_data)
                 self.load_selected_class_data()
             dialog.accept()
 
@@ -1286,7 +2063,8 @@ class TeacherWindow(QWidget):
         
         ans = QMessageBox.question(self, "Confirm", f"Delete class '{c_name}'?")
         if ans == QMessageBox.StandardButton.Yes:
-            os.remove(os.path.join(get_data_path("classes"), f"{c_name}.json"))
+            storage.remove_file(os.path.join(get_data_path("classes"), f"{c_name}.json"))
+            roster_index.remove(c_name)
             self.refresh_class_list()
             self.load_selected_class_data()
 
@@ -1300,8 +2078,7 @@ class TeacherWindow(QWidget):
             try:
                 class_name = self.class_picker.currentText()
                 if class_name != "No classes found":
-                    with open(os.path.join(get_data_path("classes"), f"{class_name}.json"), "w", encoding="utf-8") as f:
-                        json.dump(self.current_class_data, f, indent=4, ensure_ascii=False)
+                    storage.write_json(os.path.join(get_data_path("classes"), f"{class_name}.json"), self.current_class_data)
                     
                     QMessageBox.information(self, "Success", f"Exam '{exam_name}' unassigned successfully!")
                     self.load_selected_class_data()
@@ -1375,8 +2152,7 @@ class TeacherWindow(QWidget):
         
         try:
             self.current_class_data.setdefault("exams", []).append(exam_name)
-            with open(os.path.join(get_data_path("classes"), f"{class_name}.json"), "w", encoding="utf-8") as f:
-                json.dump(self.current_class_data, f, indent=4, ensure_ascii=False)
+            storage.write_json(os.path.join(get_data_path("classes"), f"{class_name}.json"), self.current_class_data)
             QMessageBox.information(self, "Success", f"Exam '{exam_name}' assigned successfully!")
             self.load_selected_class_data()
         except Exception as e:
@@ -1395,7 +2171,8 @@ class TeacherWindow(QWidget):
             try:
                 exam_path = os.path.join(get_data_path("exams"), f"{exam_name}.json")
                 if os.path.exists(exam_path):
-                    os.remove(exam_path)
+                    storage.remove_file(exam_path)
+                    exam_cache.invalidate(exam_name)
                     QMessageBox.information(self, "Success", f"Exam '{exam_name}' deleted successfully!")
                     self.refresh_available_exams()
                     # Also refresh the assign exam dialog if it's open